@@ -29,7 +29,7 @@ REQUIREMENTS = [
     'lxml>=3.0',
     'html5lib>=0.999999999',
     'tinycss==0.3',
-    'cssselect>=0.6',
+    'cssselect>=1.0',
     'cffi>=0.6',
     'cairocffi>=0.5',
     'Pyphen>=0.8'
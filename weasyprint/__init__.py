@@ -16,7 +16,6 @@
 from __future__ import division, unicode_literals
 
 import contextlib  # noqa
-import html5lib  # noqa
 
 
 VERSION = '0.31'
@@ -83,6 +82,8 @@ class HTML(object):
             if source_type == 'tree':
                 result = source
             else:
+                # html5lib is imported here as it is slow to import
+                import html5lib
                 if isinstance(source, unicode):
                     result = html5lib.parse(
                         source, treebuilder='lxml',
@@ -105,16 +106,16 @@ class HTML(object):
         self.media_type = media_type
 
     def _ua_stylesheets(self):
-        return [HTML5_UA_STYLESHEET]
+        return [get_ua_stylesheet('html5_ua.css')]
 
     def _ph_stylesheets(self):
-        return [HTML5_PH_STYLESHEET]
+        return [get_ua_stylesheet('html5_ph.css')]
 
     def _get_metadata(self):
         return get_html_metadata(self.root_element)
 
     def render(self, stylesheets=None, enable_hinting=False,
-               presentational_hints=False):
+               presentational_hints=False, jobs=1):
         """Lay out and paginate the document, but do not (yet) export it
         to PDF or another format.
 
@@ -136,14 +137,19 @@ class HTML(object):
         :type presentational_hints: bool
         :param presentational_hints: Whether HTML presentational hints are
             followed.
+        :type jobs: int
+        :param jobs: The number of processes laying out the parts of the
+            document that start with forced page breaks, such as chapters.
+            Only available on systems where processes can be forked.
         :returns: A :class:`~document.Document` object.
 
         """
         return Document._render(
-            self, stylesheets, enable_hinting, presentational_hints)
+            self, stylesheets, enable_hinting, presentational_hints, jobs)
 
     def write_pdf(self, target=None, stylesheets=None, zoom=1,
-                  attachments=None, presentational_hints=False):
+                  attachments=None, presentational_hints=False,
+                  streaming=False, jobs=1):
         """Render the document to a PDF file.
 
         This is a shortcut for calling :meth:`render`, then
@@ -169,14 +175,28 @@ class HTML(object):
         :type presentational_hints: bool
         :param presentational_hints: Whether HTML presentational hints are
             followed.
+        :type streaming: bool
+        :param streaming: Whether each page is painted and released as soon
+            as it is laid out, instead of keeping all the pages in memory.
+            When the total number of pages is displayed in page margins, or
+            when the document has fixed boxes, the document is laid out twice.
+        :type jobs: int
+        :param jobs: The number of processes laying out the parts of the
+            document that start with forced page breaks. Ignored when
+            :obj:`streaming` is true.
         :returns:
             The PDF as byte string if :obj:`target` is not provided or
             :obj:`None`, otherwise :obj:`None` (the PDF is written to
             :obj:`target`.)
 
         """
-        return self.render(stylesheets, presentational_hints).write_pdf(
-            target, zoom, attachments)
+        if streaming:
+            return Document._write_pdf_streaming(
+                self, stylesheets, target, zoom, attachments,
+                presentational_hints)
+        return self.render(
+            stylesheets, presentational_hints=presentational_hints,
+            jobs=jobs).write_pdf(target, zoom, attachments)
 
     def write_image_surface(self, stylesheets=None, resolution=96,
                             presentational_hints=False):
@@ -187,7 +207,7 @@ class HTML(object):
         return surface
 
     def write_png(self, target=None, stylesheets=None, resolution=96,
-                  presentational_hints=False):
+                  presentational_hints=False, jobs=1, streaming=False):
         """Paint the pages vertically to a single PNG image.
 
         There is no decoration around pages other than those specified in CSS
@@ -210,6 +230,12 @@ class HTML(object):
         :type presentational_hints: bool
         :param presentational_hints: Whether HTML presentational hints are
             followed.
+        :type jobs: int
+        :param jobs: The number of processes laying out the parts of the
+            document that start with forced page breaks.
+        :type streaming: bool
+        :param streaming: Whether the pages are painted and compressed one
+            by one, so that the whole image is never kept in memory.
         :returns:
             The image as byte string if :obj:`target` is not provided or
             :obj:`None`, otherwise :obj:`None` (the image is written to
@@ -218,8 +244,8 @@ class HTML(object):
         """
         png_bytes, _width, _height = (
             self.render(stylesheets, enable_hinting=True,
-                        presentational_hints=presentational_hints)
-            .write_png(target, resolution))
+                        presentational_hints=presentational_hints, jobs=jobs)
+            .write_png(target, resolution, streaming))
         return png_bytes
 
 
@@ -243,22 +269,36 @@ class CSS(object):
             base_url=base_url, url_fetcher=url_fetcher,
             check_css_mime_type=_check_mime_type,)
         with result as (source_type, source, base_url, protocol_encoding):
-            if source_type == 'string' and not isinstance(source, bytes):
+            if source_type == 'file_obj':
+                source = source.read()
+            cache_key = get_cache_key(
+                source, base_url, media_type, encoding, protocol_encoding)
+            # Warnings are only logged when the stylesheet is actually
+            # parsed, not when it is loaded from the cache.
+            rules = load_rules(cache_key)
+            if rules is not None:
+                stylesheet = None
+            elif source_type == 'string' and not isinstance(source, bytes):
                 # unicode, no encoding
                 stylesheet = PARSER.parse_stylesheet(source)
             else:
-                if source_type == 'file_obj':
-                    source = source.read()
                 stylesheet = PARSER.parse_stylesheet_bytes(
                     source, linking_encoding=encoding,
                     protocol_encoding=protocol_encoding)
         self.base_url = base_url
-        self.rules = list(preprocess_stylesheet(
-            media_type, base_url, stylesheet.rules, url_fetcher))
         # TODO: do not keep this self.stylesheet around?
         self.stylesheet = stylesheet
+        if stylesheet is None:
+            self.rules = rules
+            return
+        self.rules = list(preprocess_stylesheet(
+            media_type, base_url, stylesheet.rules, url_fetcher))
         for error in self.stylesheet.errors:
             LOGGER.warning(error)
+        # Imported stylesheets are included in the rules but not in the
+        # cache key, stylesheets with @import rules are not cached.
+        if not any(rule.at_keyword == '@import' for rule in stylesheet.rules):
+            store_rules(cache_key, self.rules)
 
 
 class Attachment(object):
@@ -355,7 +395,6 @@ def _select_source(guess=None, filename=None, url=None, file_obj=None,
 
 # Work around circular imports.
 from .css import PARSER, preprocess_stylesheet  # noqa
-from .html import (
-    find_base_url, HTML5_UA_STYLESHEET, HTML5_PH_STYLESHEET,
-    get_html_metadata)  # noqa
+from .css.stylesheet_cache import get_cache_key, load_rules, store_rules  # noqa
+from .html import find_base_url, get_ua_stylesheet, get_html_metadata  # noqa
 from .document import Document, Page  # noqa
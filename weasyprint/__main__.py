@@ -70,6 +70,11 @@ def main(argv=None, stdout=None, stdin=None):
 
         Follow HTML presentational hints.
 
+    .. option:: -j <number>, --jobs <number>
+
+        Lay out the parts of the document that start with forced page breaks
+        in this number of processes. Defaults to 1.
+
     .. option:: --version
 
         Show the version number. Other options and arguments are ignored.
@@ -106,6 +111,9 @@ def main(argv=None, stdout=None, stdin=None):
                              'to attach to the PDF document')
     parser.add_argument('-p', '--presentational-hints', action='store_true',
                         help='Follow HTML presentational hints.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of processes laying out the parts of '
+                             'the document separated by forced page breaks.')
     parser.add_argument(
         'input', help='URL or filename of the HTML input, or - for stdin')
     parser.add_argument(
@@ -147,6 +155,8 @@ def main(argv=None, stdout=None, stdin=None):
     kwargs = {
         'stylesheets': args.stylesheet,
         'presentational_hints': args.presentational_hints}
+    if args.jobs != 1:
+        kwargs['jobs'] = args.jobs
     if args.resolution:
         if format_ == 'png':
             kwargs['resolution'] = args.resolution
@@ -32,7 +32,7 @@ from .validation import preprocess_declarations
 from ..urls import (element_base_url, get_url_attribute, url_join,
                     URLFetchingError)
 from ..logger import LOGGER
-from ..compat import iteritems
+from ..compat import iteritems, basestring
 from .. import CSS
 
 
@@ -70,37 +70,99 @@ RE_INITIAL_NOT_COMPUTED = re.compile(
     '^(display|column_gap|'
     '(border_[a-z]+|outline|column_rule)_(width|color))$').match
 
+# Class names as split by ``normalize-space()`` in the XPath expressions
+# generated by cssselect for class selectors.
+CLASS_NAMES_RE = re.compile('[^ \t\n\r]+')
+
+
+# Names of the properties stored in ``StyleDict`` objects, inherited
+# properties first so that they can be copied from the parent in one slice.
+PROPERTY_NAMES = tuple(sorted(properties.INHERITED)) + tuple(sorted(
+    set(properties.INITIAL_VALUES) - properties.INHERITED))
+INHERITED_COUNT = len(properties.INHERITED)
+PROPERTY_INDEXES = dict((name, i) for i, name in enumerate(PROPERTY_NAMES))
+
+# Marker for values missing in a ``StyleDict``.
+MISSING = object()
+
+# Values of the non-inherited properties for elements that do not declare
+# them. Initial values that need computing are missing from the computed
+# values.
+INITIAL_SPECIFIED_VALUES = [
+    properties.INITIAL_VALUES[name]
+    for name in PROPERTY_NAMES[INHERITED_COUNT:]]
+INITIAL_COMPUTED_VALUES = [
+    MISSING if RE_INITIAL_NOT_COMPUTED(name)
+    else properties.INITIAL_VALUES[name]
+    for name in PROPERTY_NAMES[INHERITED_COUNT:]]
+INITIAL_NOT_COMPUTED = [
+    name for name in PROPERTY_NAMES if RE_INITIAL_NOT_COMPUTED(name)]
+assert all(PROPERTY_INDEXES[name] >= INHERITED_COUNT
+           for name in INITIAL_NOT_COMPUTED)
+
+# Values of the non-inherited properties for anonymous boxes: the initial
+# values, except that border-*-style is none, so border-width computes to
+# zero. Other than that, properties that would need computing are
+# border-*-color, but they do not apply.
+ANONYMOUS_VALUES = [
+    0 if name in ('border_top_width', 'border_right_width',
+                  'border_bottom_width', 'border_left_width',
+                  'outline_width')
+    else properties.INITIAL_VALUES[name]
+    for name in PROPERTY_NAMES[INHERITED_COUNT:]]
+
 
 class StyleDict(object):
     """A mapping (dict-like) that allows attribute access to values.
 
     Allow eg. ``style.font_size`` instead of ``style['font-size']``.
 
-    :param parent: if given, should be a mapping. Values missing from this
-                   dict will be looked up in the parent dict. Setting a value
-                   in this dict masks any value in the parent.
+    Values are stored in a list indexed by ``PROPERTY_INDEXES``, only known
+    properties can be stored.
+
+    :param data: if given, should be a mapping of initial values.
+    :param parent: if given, should be a mapping. Values missing from
+                   ``data`` are taken from this mapping.
 
     """
+    __slots__ = ('_values', '_shared', 'anonymous')
+
     def __init__(self, data=None, parent=None):
-        if data is None:
-            data = {}
-        else:
-            data = dict(data)
         if parent is None:
-            parent = {}
+            values = [MISSING] * len(PROPERTY_NAMES)
+        elif isinstance(parent, StyleDict):
+            values = list(parent._values)
+        else:
+            values = [parent.get(name, MISSING) for name in PROPERTY_NAMES]
+        if data is not None:
+            for key, value in iteritems(data):
+                values[PROPERTY_INDEXES[key]] = value
         # work around our own __setattr__
-        object.__setattr__(self, '_storage', data)
-        object.__setattr__(self, '_parent', parent)
+        object.__setattr__(self, '_values', values)
+        # True if the list of values may be used by another StyleDict
+        object.__setattr__(self, '_shared', False)
+        object.__setattr__(self, 'anonymous', False)
+
+    @classmethod
+    def _from_values(cls, values, anonymous=False):
+        """Create a new StyleDict owning the list of ``values``."""
+        style = cls.__new__(cls)
+        object.__setattr__(style, '_values', values)
+        object.__setattr__(style, '_shared', False)
+        object.__setattr__(style, 'anonymous', anonymous)
+        return style
 
     def __getitem__(self, key):
-        storage = self._storage
-        if key in storage:
-            return storage[key]
-        else:
-            return self._parent[key]
+        value = self._values[PROPERTY_INDEXES[key]]
+        if value is MISSING:
+            raise KeyError(key)
+        return value
 
     def __setitem__(self, key, value):
-        self._storage[key] = value
+        if self._shared:
+            object.__setattr__(self, '_values', list(self._values))
+            object.__setattr__(self, '_shared', False)
+        self._values[PROPERTY_INDEXES[key]] = value
 
     def get_color(self, key):
         value = self[key]
@@ -108,31 +170,36 @@ class StyleDict(object):
 
     def updated_copy(self, other):
         copy = self.copy()
-        copy._storage.update(other)
+        for key, value in iteritems(other):
+            copy[key] = value
         return copy
 
     def __contains__(self, key):
-        return key in self._parent or key in self._storage
+        index = PROPERTY_INDEXES.get(key)
+        return index is not None and self._values[index] is not MISSING
 
     __getattr__ = __getitem__  # May raise KeyError instead of AttributeError
     __setattr__ = __setitem__
 
+    def __getstate__(self):
+        return self._values, self.anonymous
+
+    def __setstate__(self, state):
+        values, anonymous = state
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_shared', False)
+        object.__setattr__(self, 'anonymous', anonymous)
+
     def copy(self):
         """Copy the ``StyleDict``.
 
-        Create a new StyleDict with this one as the parent. This is a cheap
-        "copy-on-write". Modifications in the copy will not affect
-        the original, but modifications in the original *may* affect the
-        copy.
+        This is a cheap "copy-on-write": the list of values is shared until
+        the original or the copy is modified.
 
         """
-        if self._storage:
-            parent = self
-        else:
-            parent = self._parent
-        style = type(self)(parent=parent)
-        if self.anonymous:
-            object.__setattr__(style, 'anonymous', True)
+        object.__setattr__(self, '_shared', True)
+        style = self._from_values(self._values, self.anonymous)
+        object.__setattr__(style, '_shared', True)
         return style
 
     def inherit_from(self):
@@ -148,8 +215,27 @@ class StyleDict(object):
         object.__setattr__(style, 'anonymous', True)
         return style
 
-    # Default values, may be overriden on instances
-    anonymous = False
+
+def style_property(name):
+    """Return a property giving attribute access to ``name`` in styles.
+
+    Class attributes are found without going through ``__getattr__``, whose
+    cost includes raising an internal ``AttributeError``.
+
+    """
+    index = PROPERTY_INDEXES[name]
+
+    def getter(style):
+        value = style._values[index]
+        if value is MISSING:
+            raise KeyError(name)
+        return value
+    return property(getter)
+
+
+for _name in PROPERTY_NAMES:
+    setattr(StyleDict, _name, style_property(_name))
+del _name
 
 
 def get_child_text(element):
@@ -517,14 +603,38 @@ def add_declaration(cascaded_styles, prop_name, prop_values, weight, element,
         style[prop_name] = prop_values, weight
 
 
+def depends_on_element(cascaded):
+    """Return whether computed values depend on the element itself.
+
+    Other computed values only depend on the cascaded values, the parent
+    style and the root style.
+
+    """
+    for name in ('anchor', 'link', 'lang'):
+        if name in cascaded:
+            values, _weight = cascaded[name]
+            if isinstance(values, tuple) and values[0] == 'attr':
+                return True
+    if 'content' in cascaded:
+        values, _weight = cascaded['content']
+        if isinstance(values, list) and any(
+                type_ == 'attr' for type_, _value in values):
+            return True
+    return False
+
+
 def set_computed_styles(cascaded_styles, computed_styles, element, parent,
-                        root=None, pseudo_type=None):
+                        root=None, pseudo_type=None, shared_styles=None):
     """Set the computed values of styles to ``element``.
 
     Take the properties left by ``apply_style_rule`` on an element or
     pseudo-element and assign computed values with respect to the cascade,
     declaration priority (ie. ``!important``) and selector specificity.
 
+    If ``shared_styles`` is a dict, it is used to share the same computed
+    style between elements with the same cascaded values and parent style,
+    typically siblings such as table cells or list items.
+
     """
     parent_style = computed_styles[parent, None] \
         if parent is not None else None
@@ -534,9 +644,25 @@ def set_computed_styles(cascaded_styles, computed_styles, element, parent,
         if element is root else computed_styles[root, None]
     cascaded = cascaded_styles.get((element, pseudo_type), {})
 
-    computed_styles[element, pseudo_type] = computed_from_cascaded(
-        element, cascaded, parent_style, pseudo_type, root_style
-    )
+    # The root element (whose display is computed differently) and pages
+    # never share their styles.
+    if (shared_styles is None or element is root or parent_style is None or
+            isinstance(element, basestring) or depends_on_element(cascaded)):
+        computed_styles[element, pseudo_type] = computed_from_cascaded(
+            element, cascaded, parent_style, pseudo_type, root_style)
+        return
+
+    # Values come from the declarations of stylesheets, elements with the
+    # same values objects have the same cascaded values.
+    key = (
+        frozenset((name, id(values))
+                  for name, (values, _weight) in iteritems(cascaded)),
+        parent_style, pseudo_type, root_style['font_size'])
+    style = shared_styles.get(key)
+    if style is None:
+        style = shared_styles[key] = computed_from_cascaded(
+            element, cascaded, parent_style, pseudo_type, root_style)
+    computed_styles[element, pseudo_type] = style
 
 
 def computed_from_cascaded(element, cascaded, parent_style, pseudo_type=None,
@@ -545,56 +671,133 @@ def computed_from_cascaded(element, cascaded, parent_style, pseudo_type=None,
     if not cascaded and parent_style is not None:
         # Fast path for anonymous boxes:
         # no cascaded style, only implicitly initial or inherited values.
-        computed = StyleDict(parent=properties.INITIAL_VALUES)
-        for name in properties.INHERITED:
-            computed[name] = parent_style[name]
-        # border-*-style is none, so border-width computes to zero.
-        # Other than that, properties that would need computing are
-        # border-*-color, but they do not apply.
-        for side in ('top', 'bottom', 'left', 'right'):
-            computed['border_%s_width' % side] = 0
-        computed['outline_width'] = 0
-        return computed
-
-    # Handle inheritance and initial values
-    specified = StyleDict()
-    computed = StyleDict()
-    for name, initial in iteritems(properties.INITIAL_VALUES):
-        if name in cascaded:
-            value, _precedence = cascaded[name]
-            keyword = value
-        else:
-            if name in properties.INHERITED:
-                keyword = 'inherit'
-            else:
-                keyword = 'initial'
+        values = parent_style._values[:INHERITED_COUNT]
+        values.extend(ANONYMOUS_VALUES)
+        return StyleDict._from_values(values)
+
+    # Handle inheritance and initial values. Values of properties missing
+    # from the cascade are the same for all elements with the same parent:
+    # only properties in the cascade and initial values that are not
+    # computed values are computed.
+    if parent_style is None:
+        specified = [
+            properties.INITIAL_VALUES[name]
+            for name in PROPERTY_NAMES[:INHERITED_COUNT]]
+    else:
+        # Values in parent_style are already computed.
+        specified = parent_style._values[:INHERITED_COUNT]
+    computed = specified + INITIAL_COMPUTED_VALUES
+    specified.extend(INITIAL_SPECIFIED_VALUES)
+
+    names = list(INITIAL_NOT_COMPUTED)
+    for name, (value, _precedence) in iteritems(cascaded):
+        index = PROPERTY_INDEXES[name]
+        keyword = value
 
         if keyword == 'inherit' and parent_style is None:
             # On the root element, 'inherit' from initial values
             keyword = 'initial'
 
         if keyword == 'initial':
-            value = initial
-            if not RE_INITIAL_NOT_COMPUTED(name):
+            value = properties.INITIAL_VALUES[name]
+            if RE_INITIAL_NOT_COMPUTED(name):
+                computed[index] = MISSING
+            else:
                 # The value is the same as when computed
-                computed[name] = value
+                computed[index] = value
         elif keyword == 'inherit':
             value = parent_style[name]
             # Values in parent_style are already computed.
-            computed[name] = value
+            computed[index] = value
+        else:
+            computed[index] = MISSING
+            names.append(name)
 
-        specified[name] = value
+        specified[index] = value
 
+    names.sort(key=computed_values.COMPUTING_INDEXES.get)
     return computed_values.compute(
-        element, pseudo_type, specified, computed, parent_style, root_style
-    )
+        element, pseudo_type, StyleDict._from_values(specified),
+        StyleDict._from_values(computed), parent_style, root_style, names)
 
 
 class Selector(object):
-    def __init__(self, specificity, pseudo_element, match):
+    def __init__(self, specificity, pseudo_element, match, key=None):
         self.specificity = specificity
         self.pseudo_element = pseudo_element
         self.match = match
+        # Key of the selector in the cascade rule index, see selector_key().
+        # None for @page selectors, whose match() returns page types.
+        self.key = key
+
+    def __getstate__(self):
+        # Compiled XPath expressions and closures can not be pickled.
+        if self.key is None:
+            match = self.match(None)
+        else:
+            match = self.match.path
+        return self.specificity, self.pseudo_element, match, self.key
+
+    def __setstate__(self, state):
+        self.specificity, self.pseudo_element, match, self.key = state
+        if self.key is None:
+            self.match = page_types_matcher(match)
+        else:
+            self.match = lxml.etree.XPath(match)
+
+
+def page_types_matcher(page_types):
+    """Return a ``match`` function for @page selectors."""
+    return lambda _document: page_types
+
+
+class ElementTranslator(cssselect.HTMLTranslator):
+    """Translate selectors into XPath expressions testing a single element.
+
+    cssselect walks combinators from left to right, starting from the root
+    of the document. Here, the element being tested is the context node and
+    combinators are walked backwards through ancestor and sibling axes. The
+    resulting expressions must be used with the ``self::`` prefix.
+
+    """
+    def xpath_descendant_combinator(self, left, right):
+        return right.add_condition('ancestor::%s' % left)
+
+    def xpath_child_combinator(self, left, right):
+        return right.add_condition('parent::%s' % left)
+
+    def xpath_direct_adjacent_combinator(self, left, right):
+        return right.add_condition('preceding-sibling::*[1]/self::%s' % left)
+
+    def xpath_indirect_adjacent_combinator(self, left, right):
+        return right.add_condition('preceding-sibling::%s' % left)
+
+
+def selector_key(parsed_tree):
+    """Return the key used to index a selector in the cascade.
+
+    The key is taken from the rightmost compound selector, it is the first
+    of ``('id', id)``, ``('class', class_name)``, ``('tag', tag)`` or
+    ``('*', None)`` that applies. An element can only match the selector if
+    it has this id, class or tag.
+
+    """
+    if isinstance(parsed_tree, cssselect.parser.CombinedSelector):
+        parsed_tree = parsed_tree.subselector
+    key = ('*', None)
+    while parsed_tree is not None:
+        if isinstance(parsed_tree, cssselect.parser.Hash):
+            return 'id', parsed_tree.id
+        elif isinstance(parsed_tree, cssselect.parser.Class):
+            key = 'class', parsed_tree.class_name
+        elif isinstance(parsed_tree, cssselect.parser.Element):
+            if (key[0] == '*' and parsed_tree.element and
+                    parsed_tree.namespace is None):
+                key = 'tag', parsed_tree.element.lower()
+            break
+        # Pseudo-classes, attributes and negations wrap another selector.
+        parsed_tree = getattr(parsed_tree, 'selector', None)
+    return key
 
 
 def preprocess_stylesheet(device_media_type, base_url, rules, url_fetcher):
@@ -602,7 +805,7 @@ def preprocess_stylesheet(device_media_type, base_url, rules, url_fetcher):
     in a document.
 
     """
-    selector_to_xpath = cssselect.HTMLTranslator().selector_to_xpath
+    selector_to_xpath = ElementTranslator().selector_to_xpath
     for rule in rules:
         if not rule.at_keyword:
             declarations = list(preprocess_declarations(
@@ -612,7 +815,7 @@ def preprocess_stylesheet(device_media_type, base_url, rules, url_fetcher):
                 try:
                     selector_list = []
                     for selector in cssselect.parse(selector_string):
-                        xpath = selector_to_xpath(selector)
+                        xpath = selector_to_xpath(selector, prefix='self::')
                         try:
                             lxml_xpath = lxml.etree.XPath(xpath)
                         except ValueError as exc:
@@ -623,7 +826,8 @@ def preprocess_stylesheet(device_media_type, base_url, rules, url_fetcher):
                             raise cssselect.SelectorError(str(exc))
                         selector_list.append(Selector(
                             (0,) + selector.specificity(),
-                            selector.pseudo_element, lxml_xpath))
+                            selector.pseudo_element, lxml_xpath,
+                            selector_key(selector.parsed_tree)))
                     for selector in selector_list:
                         if selector.pseudo_element not in PSEUDO_ELEMENTS:
                             raise cssselect.ExpressionError(
@@ -669,9 +873,7 @@ def preprocess_stylesheet(device_media_type, base_url, rules, url_fetcher):
             declarations = list(preprocess_declarations(
                 base_url, rule.declarations))
 
-            # Use a double lambda to have a closure that holds page_types
-            match = (lambda page_types: lambda _document: page_types)(
-                PAGE_PSEUDOCLASS_TARGETS[pseudo_class])
+            match = page_types_matcher(PAGE_PSEUDOCLASS_TARGETS[pseudo_class])
             specificity = rule.specificity
 
             if declarations:
@@ -720,6 +922,18 @@ def get_all_computed_styles(html, user_stylesheets=None,
     #             http://www.w3.org/TR/CSS21/cascade.html#cascading-order
     cascaded_styles = {}
 
+    # Element selectors are not matched against the whole document one
+    # after the other. They are indexed by their key (see selector_key) and
+    # the document is walked once, testing each element against the
+    # selectors whose key it has.
+    # keys: selector keys
+    # values: lists of (order, match, pseudo_type, declarations)
+    #     order: the position of the selector in the cascade, so that
+    #         declarations with the same weight are applied in source order
+    #     declarations: lists of (name, values, weight)
+    selectors_by_key = {}
+    order = 0
+
     for sheets, origin, sheet_specificity in (
         # Order here is not important ('origin' is).
         # Use this order for a regression test
@@ -733,14 +947,47 @@ def get_all_computed_styles(html, user_stylesheets=None,
                 for selector in selector_list:
                     specificity = sheet_specificity or selector.specificity
                     pseudo_type = selector.pseudo_element
-                    for element in selector.match(element_tree):
-                        for name, values, importance in declarations:
-                            precedence = declaration_precedence(
-                                origin, importance)
-                            weight = (precedence, specificity)
-                            add_declaration(
-                                cascaded_styles, name, values, weight,
-                                element, pseudo_type)
+                    weighted_declarations = [
+                        (name, values, (
+                            declaration_precedence(origin, importance),
+                            specificity))
+                        for name, values, importance in declarations]
+                    if selector.key is None:
+                        # @page selectors
+                        for element in selector.match(element_tree):
+                            for name, values, weight in weighted_declarations:
+                                add_declaration(
+                                    cascaded_styles, name, values, weight,
+                                    element, pseudo_type)
+                    else:
+                        selectors_by_key.setdefault(selector.key, []).append(
+                            (order, selector.match, pseudo_type,
+                             weighted_declarations))
+                        order += 1
+
+    universal_selectors = selectors_by_key.get(('*', None), [])
+    for element in element_tree.iter():
+        tag = element.tag
+        if not isinstance(tag, basestring):
+            # Comments and processing instructions
+            continue
+        candidates = list(universal_selectors)
+        candidates.extend(selectors_by_key.get(('tag', tag), ()))
+        element_id = element.get('id')
+        if element_id:
+            candidates.extend(selectors_by_key.get(('id', element_id), ()))
+        class_names = element.get('class')
+        if class_names:
+            for class_name in set(CLASS_NAMES_RE.findall(class_names)):
+                candidates.extend(
+                    selectors_by_key.get(('class', class_name), ()))
+        candidates.sort(key=lambda candidate: candidate[0])
+        for _order, match, pseudo_type, declarations in candidates:
+            if match(element):
+                for name, values, weight in declarations:
+                    add_declaration(
+                        cascaded_styles, name, values, weight, element,
+                        pseudo_type)
 
     for specificity, attributes in find_style_attributes(
             element_tree, presentational_hints):
@@ -757,6 +1004,11 @@ def get_all_computed_styles(html, user_stylesheets=None,
     #     values: a PropertyValue-like object
     computed_styles = {}
 
+    # keys: (cascaded values, parent style, pseudo_element_type, root font
+    #        size), see set_computed_styles
+    # values: StyleDict objects shared by elements with the same key
+    shared_styles = {}
+
     # First, computed styles for "real" elements *in tree order*
     # Tree order is important so that parents have computed styles before
     # their children, for inheritance.
@@ -764,7 +1016,8 @@ def get_all_computed_styles(html, user_stylesheets=None,
     # Iterate on all elements, even if there is no cascaded style for them.
     for element in element_tree.iter():
         set_computed_styles(cascaded_styles, computed_styles, element,
-                            root=element_tree, parent=element.getparent())
+                            root=element_tree, parent=element.getparent(),
+                            shared_styles=shared_styles)
 
     # Then computed styles for @page.
 
@@ -790,7 +1043,8 @@ def get_all_computed_styles(html, user_stylesheets=None,
             set_computed_styles(cascaded_styles, computed_styles,
                                 element, pseudo_type=pseudo_type,
                                 # The pseudo-element inherits from the element.
-                                root=element_tree, parent=element)
+                                root=element_tree, parent=element,
+                                shared_styles=shared_styles)
 
     # This is mostly useful to make pseudo_type optional.
     def style_for(element, pseudo_type=None, __get=computed_styles.get):
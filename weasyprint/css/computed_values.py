@@ -15,6 +15,7 @@ from __future__ import division, unicode_literals
 
 from .properties import INITIAL_VALUES, Dimension
 from ..urls import get_link_attribute
+from ..lru import LRUCache
 from .. import text
 
 
@@ -127,6 +128,11 @@ PAGE_SIZES = dict(
 for w, h in PAGE_SIZES.values():
     assert w.value < h.value
 
+# Results of ex_ratio(), font_zero_width() and strut_layout(), keyed by
+# text.font_key() and the other parameters of these functions. The ``hits`` and
+# ``misses`` attributes of the cache count lookups.
+FONT_METRICS_CACHE = LRUCache(max_size=1024)
+
 INITIAL_PAGE_SIZE = PAGE_SIZES['a4']
 INITIAL_VALUES['size'] = tuple(
     d.value * LENGTHS_TO_PIXELS[d.unit] for d in INITIAL_PAGE_SIZE)
@@ -136,12 +142,17 @@ def _computing_order():
     """Some computed values are required by others, so order matters."""
     first = [
         'font_stretch', 'font_weight', 'font_family', 'font_variant',
-        'font_style', 'font_size', 'line_height']
+        'font_style']
+    # ex and ch units in font-size depend on all the font properties
+    first += [name for name in text.FONT_PROPERTIES if name not in first]
+    first += ['font_size', 'line_height']
     order = sorted(INITIAL_VALUES)
     for name in first:
         order.remove(name)
     return tuple(first + order)
 COMPUTING_ORDER = _computing_order()
+COMPUTING_INDEXES = dict(
+    (name, index) for index, name in enumerate(COMPUTING_ORDER))
 
 # Maps property names to functions returning the computed values
 COMPUTER_FUNCTIONS = {}
@@ -159,7 +170,7 @@ def register_computer(name):
 
 
 def compute(element, pseudo_type, specified, computed, parent_style,
-            root_style):
+            root_style, names=COMPUTING_ORDER):
     """
     Return a StyleDict of computed values.
 
@@ -172,6 +183,8 @@ def compute(element, pseudo_type, specified, computed, parent_style,
     :param parent_values: a :class:`StyleDict` of computed values of the parent
                           element (should contain values for all properties),
                           or ``None`` if ``element`` is the root element.
+    :param names: the names of the properties missing in ``computed``, sorted
+                  as in ``COMPUTING_ORDER``.
     """
     if parent_style is None:
         parent_style = INITIAL_VALUES
@@ -189,7 +202,7 @@ def compute(element, pseudo_type, specified, computed, parent_style,
 
     getter = COMPUTER_FUNCTIONS.get
 
-    for name in COMPUTING_ORDER:
+    for name in names:
         if name in computed:
             # Already computed
             continue
@@ -300,17 +313,10 @@ def length(computer, name, value, font_size=None, pixels_only=False):
         if font_size is None:
             font_size = computer.computed.font_size
         if unit == 'ex':
-            # TODO: cache
             result = value.value * font_size * ex_ratio(computer.computed)
         elif unit == 'ch':
-            # TODO: cache
-            layout = text.Layout(
-                hinting=False, font_size=font_size,
-                style=computer.computed)
-            layout.set_text('0')
-            line, = layout.iter_lines()
-            logical_width, _ = text.get_size(line, computer.computed)
-            result = value.value * logical_width
+            result = value.value * font_zero_width(
+                computer.computed, font_size)
         elif unit == 'em':
             result = value.value * font_size
         elif unit == 'rem':
@@ -564,14 +570,18 @@ def strut_layout(style, hinting=True):
     The baseline is given from the top edge of line height.
 
     """
-    # TODO: cache these results for a given set of styles?
     line_height = style.line_height
     if style.font_size == 0:
         pango_height = baseline = 0
     else:
-        # TODO: get the real value for `hinting`? (if we really care…)
-        _, _, _, _, pango_height, baseline = text.split_first_line(
-            '', style, hinting=hinting, max_width=None, line_width=None)
+        key = ('strut', text.font_key(style), style.font_size, hinting)
+        metrics = FONT_METRICS_CACHE.get(key)
+        if metrics is None:
+            # TODO: get the real value for `hinting`? (if we really care…)
+            _, _, _, _, pango_height, baseline = text.split_first_line(
+                '', style, hinting=hinting, max_width=None, line_width=None)
+            FONT_METRICS_CACHE[key] = metrics = pango_height, baseline
+        pango_height, baseline = metrics
     if line_height == 'normal':
         return pango_height, baseline
     type_, value = line_height
@@ -582,11 +592,30 @@ def strut_layout(style, hinting=True):
 
 def ex_ratio(style):
     """Return the ratio 1ex/font_size, according to given style."""
-    font_size = 1000  # big value
-    layout = text.Layout(hinting=False, font_size=font_size, style=style)
-    layout.set_text('x')
-    line, = layout.iter_lines()
-    _, ink_height_above_baseline = text.get_ink_position(line)
-    # Zero means some kind of failure, fallback is 0.5.
-    # We round to try keeping exact values that were altered by Pango.
-    return round(-ink_height_above_baseline / font_size, 5) or 0.5
+    key = ('ex', text.font_key(style))
+    ratio = FONT_METRICS_CACHE.get(key)
+    if ratio is None:
+        font_size = 1000  # big value
+        layout = text.Layout(hinting=False, font_size=font_size, style=style)
+        layout.set_text('x')
+        line, = layout.iter_lines()
+        _, ink_height_above_baseline = text.get_ink_position(line)
+        # Zero means some kind of failure, fallback is 0.5.
+        # We round to try keeping exact values that were altered by Pango.
+        ratio = round(-ink_height_above_baseline / font_size, 5) or 0.5
+        FONT_METRICS_CACHE[key] = ratio
+    return ratio
+
+
+def font_zero_width(style, font_size):
+    """Return the width of "0" in pixels, used for 1ch."""
+    key = ('ch', text.font_key(style), font_size)
+    width = FONT_METRICS_CACHE.get(key)
+    if width is None:
+        layout = text.Layout(
+            hinting=False, font_size=font_size, style=style)
+        layout.set_text('0')
+        line, = layout.iter_lines()
+        width, _ = text.get_size(line, style)
+        FONT_METRICS_CACHE[key] = width
+    return width
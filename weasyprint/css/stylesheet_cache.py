@@ -0,0 +1,95 @@
+# coding: utf-8
+"""
+    weasyprint.css.stylesheet_cache
+    -------------------------------
+
+    Optional on-disk cache of preprocessed stylesheets.
+
+    Parsing a stylesheet, validating its declarations and compiling its
+    selectors is done every time a :class:`CSS` object is created. When
+    the same stylesheets are used for many documents, the result of this
+    work can be stored in a directory and loaded back instead.
+
+    The cache is disabled by default. Enable it by setting
+    :data:`CACHE_DIRECTORY`, or the ``WEASYPRINT_CSS_CACHE`` environment
+    variable before importing WeasyPrint.
+
+    :copyright: Copyright 2011-2014 Simon Sapin and contributors, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+
+"""
+
+from __future__ import division, unicode_literals
+
+import os
+import pickle
+import hashlib
+import tempfile
+
+from ..logger import LOGGER
+from .. import VERSION
+
+
+#: Directory where preprocessed stylesheets are stored, or :obj:`None`
+#: to disable the cache.
+CACHE_DIRECTORY = os.environ.get('WEASYPRINT_CSS_CACHE') or None
+
+
+def get_cache_key(source, base_url, media_type, encoding=None,
+                  protocol_encoding=None):
+    """Return the cache key of a stylesheet, or :obj:`None`.
+
+    :obj:`None` is returned when the cache is disabled.
+
+    :param source: the stylesheet source, as a byte or Unicode string.
+
+    """
+    if CACHE_DIRECTORY is None:
+        return None
+    if isinstance(source, bytes):
+        source = b'b' + source
+    else:
+        source = b'u' + source.encode('utf8')
+    key = hashlib.sha256(source)
+    for value in (VERSION, base_url, media_type, encoding, protocol_encoding):
+        key.update(b'\0' + ('' if value is None else value).encode('utf8'))
+    return key.hexdigest()
+
+
+def load_rules(key):
+    """Return the preprocessed rules stored for ``key``, or :obj:`None`."""
+    if key is None:
+        return None
+    try:
+        with open(os.path.join(CACHE_DIRECTORY, key), 'rb') as cache_file:
+            return pickle.load(cache_file)
+    except Exception:
+        # Missing, corrupted or incompatible file: parse the stylesheet again
+        return None
+
+
+def store_rules(key, rules):
+    """Store preprocessed ``rules`` for ``key``.
+
+    The file is written to a temporary name and then renamed, so that
+    other processes sharing the cache never read a partial file.
+
+    """
+    if key is None:
+        return
+    try:
+        if not os.path.isdir(CACHE_DIRECTORY):
+            os.makedirs(CACHE_DIRECTORY)
+        fd, temp_name = tempfile.mkstemp(dir=CACHE_DIRECTORY)
+    except (IOError, OSError) as exc:
+        LOGGER.warning('Failed to store stylesheet in cache: %s', exc)
+        return
+    try:
+        with os.fdopen(fd, 'wb') as cache_file:
+            pickle.dump(rules, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_name, os.path.join(CACHE_DIRECTORY, key))
+    except Exception as exc:
+        # The file may also have been stored by another process in the
+        # meantime, renaming then fails on Windows.
+        LOGGER.warning('Failed to store stylesheet in cache: %s', exc)
+        os.remove(temp_name)
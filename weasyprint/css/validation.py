@@ -1228,6 +1228,16 @@ def table_layout(keyword):
         return keyword
 
 
+@validator(prefixed=True)  # Non-standard
+@single_token
+def table_sample_rows(token):
+    """Validation for ``table-sample-rows``."""
+    if get_keyword(token) == 'none':
+        return 'none'
+    elif token.type == 'INTEGER' and token.value >= 1:
+        return token.value
+
+
 @validator()
 @single_keyword
 def text_align(keyword):
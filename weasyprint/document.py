@@ -19,6 +19,7 @@ import cairocffi as cairo
 
 from . import CSS
 from . import images
+from . import png
 from .logger import LOGGER
 from .css import get_all_computed_styles
 from .formatting_structure import boxes
@@ -27,7 +28,13 @@ from .layout import layout_document
 from .layout.backgrounds import percentage
 from .draw import draw_page, stacked
 from .pdf import write_pdf_metadata
-from .compat import izip, iteritems, FILESYSTEM_ENCODING
+from .compat import izip, iteritems, xrange, FILESYSTEM_ENCODING
+
+
+# The document and the resolution of the processes painting the pages in
+# Document.write_pngs(). They are inherited by the forked processes instead of
+# being pickled.
+PNG_WORKER_STATE = []
 
 
 def _get_matrix(box):
@@ -90,6 +97,13 @@ def rectangle_aabb(matrix, pos_x, pos_y, width, height):
     return box_x1, box_y1, box_x2 - box_x1, box_y2 - box_y1
 
 
+def _write_page_png(index):
+    """Paint a page in a worker process and return its PNG image."""
+    document, resolution = PNG_WORKER_STATE
+    return document.copy([document.pages[index]]).write_png(
+        resolution=resolution)
+
+
 class _TaggedTuple(tuple):
     """A tuple with a :attr:`sourceline` attribute,
     The line number in the HTML source for whatever the tuple represents.
@@ -194,8 +208,33 @@ class Page(object):
             page_box, bookmarks, links, anchors, matrix=None)
         self._page_box = page_box
         self._enable_hinting = enable_hinting
+        self._display_list = None
+
+    def record(self):
+        """Record the drawing operations of the page and release its boxes.
 
-    def paint(self, cairo_context, left_x=0, top_y=0, scale=1, clip=False):
+        The page is then painted by replaying these operations in a cairo
+        recording surface, the layout of the page is not drawn again. This
+        frees the memory used by the boxes of pages painted many times, for
+        example in different formats or at different resolutions.
+
+        Pages are drawn with a scale of 1 when they are recorded. When
+        hinting is enabled, positions and text are hinted for this scale and
+        recorded pages painted at other scales may differ from pages painted
+        directly.
+
+        """
+        if self._display_list is None:
+            display_list = cairo.RecordingSurface(
+                cairo.CONTENT_COLOR_ALPHA, None)
+            draw_page(
+                self._page_box, cairo.Context(display_list),
+                self._enable_hinting)
+            self._display_list = display_list
+            self._page_box = None
+
+    def paint(self, cairo_context, left_x=0, top_y=0, scale=1, clip=False,
+              embed_jpeg=False):
         """Paint the page in cairo, on any type of surface.
 
         :param cairo_context:
@@ -216,10 +255,16 @@ class Page(object):
         :param clip:
             Whether to clip/cut content outside the page. If false or
             not provided, content can overflow.
+        :param embed_jpeg:
+            Whether JPEG images are drawn with their JPEG data only, without
+            being decoded. Only set this when painting to a
+            :class:`cairocffi.PDFSurface`, other surfaces would draw blank
+            images. Recorded pages always use decoded images.
         :type left_x: float
         :type top_y: float
         :type scale: float
         :type clip: bool
+        :type embed_jpeg: bool
 
         """
         with stacked(cairo_context):
@@ -246,7 +291,13 @@ class Page(object):
                         cairo_context.device_to_user_distance(width, height))
                 cairo_context.rectangle(0, 0, width, height)
                 cairo_context.clip()
-            draw_page(self._page_box, cairo_context, self._enable_hinting)
+            if self._display_list is None:
+                draw_page(
+                    self._page_box, cairo_context, self._enable_hinting,
+                    embed_jpeg)
+            else:
+                cairo_context.set_source_surface(self._display_list)
+                cairo_context.paint()
 
 
 class DocumentMetadata(object):
@@ -314,7 +365,16 @@ class Document(object):
     """
     @classmethod
     def _render(cls, html, stylesheets, enable_hinting,
-                presentational_hints=False):
+                presentational_hints=False, jobs=1):
+        return cls(
+            list(cls._render_pages(
+                html, stylesheets, enable_hinting, presentational_hints,
+                jobs=jobs)),
+            DocumentMetadata(**html._get_metadata()), html.url_fetcher)
+
+    @classmethod
+    def _render_pages(cls, html, stylesheets, enable_hinting,
+                      presentational_hints=False, streaming=False, jobs=1):
         style_for = get_all_computed_styles(
             html, presentational_hints=presentational_hints, user_stylesheets=[
                 css if hasattr(css, 'rules')
@@ -325,9 +385,26 @@ class Document(object):
         page_boxes = layout_document(
             enable_hinting, style_for, get_image_from_uri,
             build_formatting_structure(
-                html.root_element, style_for, get_image_from_uri))
-        return cls([Page(p, enable_hinting) for p in page_boxes],
-                   DocumentMetadata(**html._get_metadata()), html.url_fetcher)
+                html.root_element, style_for, get_image_from_uri),
+            streaming, jobs)
+        for page_box in page_boxes:
+            yield Page(page_box, enable_hinting)
+
+    @classmethod
+    def _write_pdf_streaming(cls, html, stylesheets, target, zoom,
+                             attachments, presentational_hints=False):
+        """Lay out and paint the pages one by one.
+
+        The box tree of each page is released as soon as the page is painted,
+        only its links, anchors and bookmarks are kept for the metadata.
+
+        """
+        document = cls(
+            [], DocumentMetadata(**html._get_metadata()), html.url_fetcher)
+        pages = cls._render_pages(
+            html, stylesheets, False, presentational_hints, streaming=True)
+        return document._write_pdf(
+            pages, target, zoom, attachments, release=True)
 
     def __init__(self, pages, metadata, url_fetcher):
         #: A list of :class:`Page` objects.
@@ -479,6 +556,9 @@ class Document(object):
             :obj:`None` (the PDF is written to :obj:`target`.)
 
         """
+        return self._write_pdf(self.pages, target, zoom, attachments)
+
+    def _write_pdf(self, pages, target, zoom, attachments, release=False):
         # 0.75 = 72 PDF point (cairo units) per inch / 96 CSS pixel per inch
         scale = zoom * 0.75
         # Use an in-memory buffer. We will need to seek for metadata
@@ -487,12 +567,15 @@ class Document(object):
         # (1, 1) is overridden by .set_size() below.
         surface = cairo.PDFSurface(file_obj, 1, 1)
         context = cairo.Context(surface)
-        for page in self.pages:
+        for page in pages:
             surface.set_size(
                 math.floor(page.width * scale),
                 math.floor(page.height * scale))
-            page.paint(context, scale=scale)
+            page.paint(context, scale=scale, embed_jpeg=True)
             surface.show_page()
+            if release:
+                page._page_box = None
+                self.pages.append(page)
         surface.finish()
 
         write_pdf_metadata(self, file_obj, scale, self.metadata, attachments,
@@ -531,7 +614,7 @@ class Document(object):
             pos_y += height
         return surface, max_width, sum_heights
 
-    def write_png(self, target=None, resolution=96):
+    def write_png(self, target=None, resolution=96, streaming=False):
         """Paint the pages vertically to a single PNG image.
 
         There is no decoration around pages other than those specified in CSS
@@ -544,6 +627,13 @@ class Document(object):
         :param resolution:
             The output resolution in PNG pixels per CSS inch. At 96 dpi
             (the default), PNG pixels match the CSS ``px`` unit.
+        :type streaming: bool
+        :param streaming:
+            Whether the pages are painted and compressed one by one, instead
+            of painting all the pages in a single image before compressing
+            it. The memory needed to paint the pages is then the memory of
+            the largest page, but the image is always written with an alpha
+            channel.
         :returns:
             A ``(png_bytes, png_width, png_height)`` tuple. :obj:`png_bytes`
             is a byte string if :obj:`target` is :obj:`None`, otherwise
@@ -552,6 +642,8 @@ class Document(object):
             final image, in PNG pixels.
 
         """
+        if streaming:
+            return self._write_png_streaming(target, resolution)
         surface, max_width, sum_heights = self.write_image_surface(resolution)
         if target is None:
             target = io.BytesIO()
@@ -561,3 +653,73 @@ class Document(object):
             surface.write_to_png(target)
             png_bytes = None
         return png_bytes, max_width, sum_heights
+
+    def write_pngs(self, resolution=96, jobs=1):
+        """Paint each page to its own PNG image.
+
+        :type resolution: float
+        :param resolution:
+            The output resolution in PNG pixels per CSS inch, as in
+            :meth:`write_png`.
+        :type jobs: int
+        :param jobs:
+            The number of processes painting the pages. Only available on
+            systems where processes can be forked.
+        :returns:
+            An iterator of ``(png_bytes, png_width, png_height)`` tuples like
+            the ones returned by :meth:`write_png`, one for each page, in the
+            order of :attr:`pages`.
+
+        """
+        fork_context = None
+        if jobs > 1 and len(self.pages) > 1:
+            # multiprocessing is only imported when needed
+            from .layout.parallel import get_fork_context
+            fork_context = get_fork_context()
+        if fork_context is None:
+            for page in self.pages:
+                yield self.copy([page]).write_png(resolution=resolution)
+            return
+
+        PNG_WORKER_STATE[:] = [self, resolution]
+        try:
+            pool = fork_context.Pool(min(jobs, len(self.pages)))
+            try:
+                for result in pool.imap(
+                        _write_page_png, xrange(len(self.pages))):
+                    yield result
+            finally:
+                pool.terminate()
+                pool.join()
+        finally:
+            del PNG_WORKER_STATE[:]
+
+    def _write_png_streaming(self, target, resolution):
+        dppx = resolution / 96
+        widths = [int(math.ceil(p.width * dppx)) for p in self.pages]
+        heights = [int(math.ceil(p.height * dppx)) for p in self.pages]
+        max_width = max(widths)
+        sum_heights = sum(heights)
+
+        def page_surfaces():
+            for page, width, height in izip(self.pages, widths, heights):
+                if height == 0:
+                    continue
+                surface = png.page_surface(max_width, height)
+                pos_x = (max_width - width) / 2
+                page.paint(
+                    cairo.Context(surface), pos_x, 0, scale=dppx, clip=True)
+                yield surface
+
+        if target is None:
+            file_obj = io.BytesIO()
+            png.write_png(file_obj, max_width, sum_heights, page_surfaces())
+            png_bytes = file_obj.getvalue()
+        elif hasattr(target, 'write'):
+            png.write_png(target, max_width, sum_heights, page_surfaces())
+            png_bytes = None
+        else:
+            with open(target, 'wb') as fd:
+                png.write_png(fd, max_width, sum_heights, page_surfaces())
+            png_bytes = None
+        return png_bytes, max_width, sum_heights
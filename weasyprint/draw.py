@@ -90,22 +90,31 @@ def lighten(color):
     return hsv2rgb(hue, saturation, value) + (color.alpha,)
 
 
-def draw_page(page, context, enable_hinting):
-    """Draw the given PageBox."""
+def draw_page(page, context, enable_hinting, embed_jpeg=False):
+    """Draw the given PageBox.
+
+    If ``embed_jpeg`` is true, JPEG images that are not decoded yet are drawn
+    with their JPEG data only. This is only correct when ``context`` draws to
+    a PDF file.
+
+    """
     stacking_context = StackingContext.from_page(page)
     draw_background(
-        context, stacking_context.box.background, enable_hinting,
+        context, stacking_context.box.background, enable_hinting, embed_jpeg,
         clip_box=False)
     draw_background(
-        context, page.canvas_background, enable_hinting, clip_box=False)
+        context, page.canvas_background, enable_hinting, embed_jpeg,
+        clip_box=False)
     draw_border(context, page, enable_hinting)
-    draw_stacking_context(context, stacking_context, enable_hinting)
+    draw_stacking_context(
+        context, stacking_context, enable_hinting, embed_jpeg)
 
 
-def draw_box_background_and_border(context, page, box, enable_hinting):
-    draw_background(context, box.background, enable_hinting)
+def draw_box_background_and_border(context, page, box, enable_hinting,
+                                   embed_jpeg):
+    draw_background(context, box.background, enable_hinting, embed_jpeg)
     if isinstance(box, boxes.TableBox):
-        draw_table_backgrounds(context, page, box, enable_hinting)
+        draw_table_backgrounds(context, page, box, enable_hinting, embed_jpeg)
         if box.style.border_collapse == 'separate':
             draw_border(context, box, enable_hinting)
             for row_group in box.children:
@@ -119,7 +128,8 @@ def draw_box_background_and_border(context, page, box, enable_hinting):
         draw_border(context, box, enable_hinting)
 
 
-def draw_stacking_context(context, stacking_context, enable_hinting):
+def draw_stacking_context(context, stacking_context, enable_hinting,
+                          embed_jpeg):
     """Draw a ``stacking_context`` on ``context``."""
     # See http://www.w3.org/TR/CSS2/zindex.html
     with stacked(context):
@@ -159,7 +169,8 @@ def draw_stacking_context(context, stacking_context, enable_hinting):
                             boxes.InlineBlockBox, boxes.TableCellBox)):
             # The canvas background was removed by set_canvas_background
             draw_box_background_and_border(
-                context, stacking_context.page, box, enable_hinting)
+                context, stacking_context.page, box, enable_hinting,
+                embed_jpeg)
 
         with stacked(context):
             if box.style.overflow != 'visible':
@@ -171,21 +182,25 @@ def draw_stacking_context(context, stacking_context, enable_hinting):
 
             # Point 3
             for child_context in stacking_context.negative_z_contexts:
-                draw_stacking_context(context, child_context, enable_hinting)
+                draw_stacking_context(
+                    context, child_context, enable_hinting, embed_jpeg)
 
             # Point 4
             for block in stacking_context.block_level_boxes:
                 draw_box_background_and_border(
-                    context, stacking_context.page, block, enable_hinting)
+                    context, stacking_context.page, block, enable_hinting,
+                    embed_jpeg)
 
             # Point 5
             for child_context in stacking_context.float_contexts:
-                draw_stacking_context(context, child_context, enable_hinting)
+                draw_stacking_context(
+                    context, child_context, enable_hinting, embed_jpeg)
 
             # Point 6
             if isinstance(box, boxes.InlineBox):
                 draw_inline_level(
-                    context, stacking_context.page, box, enable_hinting)
+                    context, stacking_context.page, box, enable_hinting,
+                    embed_jpeg)
 
             # Point 7
             for block in [box] + stacking_context.blocks_and_cells:
@@ -193,25 +208,27 @@ def draw_stacking_context(context, stacking_context, enable_hinting):
                 if marker_box:
                     draw_inline_level(
                         context, stacking_context.page, marker_box,
-                        enable_hinting)
+                        enable_hinting, embed_jpeg)
 
                 if isinstance(block, boxes.ReplacedBox):
-                    draw_replacedbox(context, block)
+                    draw_replacedbox(context, block, embed_jpeg)
                 else:
                     for child in block.children:
                         if isinstance(child, boxes.LineBox):
                             # TODO: draw inline tables
                             draw_inline_level(
                                 context, stacking_context.page, child,
-                                enable_hinting)
+                                enable_hinting, embed_jpeg)
 
             # Point 8
             for child_context in stacking_context.zero_z_contexts:
-                draw_stacking_context(context, child_context, enable_hinting)
+                draw_stacking_context(
+                    context, child_context, enable_hinting, embed_jpeg)
 
             # Point 9
             for child_context in stacking_context.positive_z_contexts:
-                draw_stacking_context(context, child_context, enable_hinting)
+                draw_stacking_context(
+                    context, child_context, enable_hinting, embed_jpeg)
 
         # Point 10
         draw_outlines(context, box, enable_hinting)
@@ -262,7 +279,8 @@ def rounded_box_path(context, radii):
         context.restore()
 
 
-def draw_background(context, bg, enable_hinting, clip_box=True):
+def draw_background(context, bg, enable_hinting, embed_jpeg,
+                    clip_box=True):
     """Draw the background color and image to a ``cairo.Context``.
 
     If ``clip_box`` is set to ``False``, the background is not clipped to the
@@ -294,26 +312,33 @@ def draw_background(context, bg, enable_hinting, clip_box=True):
 
         # Paint in reversed order: first layer is "closest" to the viewer.
         for layer in reversed(bg.layers):
-            draw_background_image(context, layer, bg.image_rendering)
+            draw_background_image(
+                context, layer, bg.image_rendering, embed_jpeg)
 
 
-def draw_table_backgrounds(context, page, table, enable_hinting):
+def draw_table_backgrounds(context, page, table, enable_hinting,
+                           embed_jpeg):
     """Draw the background color and image of the table children."""
     for column_group in table.column_groups:
-        draw_background(context, column_group.background, enable_hinting)
+        draw_background(
+            context, column_group.background, enable_hinting, embed_jpeg)
         for column in column_group.children:
-            draw_background(context, column.background, enable_hinting)
+            draw_background(
+                context, column.background, enable_hinting, embed_jpeg)
     for row_group in table.children:
-        draw_background(context, row_group.background, enable_hinting)
+        draw_background(
+            context, row_group.background, enable_hinting, embed_jpeg)
         for row in row_group.children:
-            draw_background(context, row.background, enable_hinting)
+            draw_background(
+                context, row.background, enable_hinting, embed_jpeg)
             for cell in row.children:
                 if table.style.border_collapse == 'collapse' or (
                         cell.style.empty_cells == 'show' or not cell.empty):
-                    draw_background(context, cell.background, enable_hinting)
+                    draw_background(
+                        context, cell.background, enable_hinting, embed_jpeg)
 
 
-def draw_background_image(context, layer, image_rendering):
+def draw_background_image(context, layer, image_rendering, embed_jpeg):
     # Background image
     if layer.image is None:
         return
@@ -357,7 +382,8 @@ def draw_background_image(context, layer, image_rendering):
     sub_context = cairo.Context(sub_surface)
     sub_context.rectangle(0, 0, image_width, image_height)
     sub_context.clip()
-    layer.image.draw(sub_context, image_width, image_height, image_rendering)
+    layer.image.draw(
+        sub_context, image_width, image_height, image_rendering, embed_jpeg)
     pattern = cairo.SurfacePattern(sub_surface)
     pattern.set_extend(cairo.EXTEND_REPEAT)
 
@@ -855,7 +881,7 @@ def draw_collapsed_borders(context, table, enable_hinting):
                 styled_color(style, color, side))
 
 
-def draw_replacedbox(context, box):
+def draw_replacedbox(context, box, embed_jpeg):
     """Draw the given :class:`boxes.ReplacedBox` to a ``cairo.context``."""
     if box.style.visibility != 'visible' or box.width == 0 or box.height == 0:
         return
@@ -865,25 +891,28 @@ def draw_replacedbox(context, box):
         context.clip()
         context.translate(box.content_box_x(), box.content_box_y())
         box.replacement.draw(
-            context, box.width, box.height, box.style.image_rendering)
+            context, box.width, box.height, box.style.image_rendering,
+            embed_jpeg)
 
 
-def draw_inline_level(context, page, box, enable_hinting):
+def draw_inline_level(context, page, box, enable_hinting, embed_jpeg):
     if isinstance(box, StackingContext):
         stacking_context = box
         assert isinstance(stacking_context.box, boxes.InlineBlockBox)
-        draw_stacking_context(context, stacking_context, enable_hinting)
+        draw_stacking_context(
+            context, stacking_context, enable_hinting, embed_jpeg)
     else:
-        draw_background(context, box.background, enable_hinting)
+        draw_background(context, box.background, enable_hinting, embed_jpeg)
         draw_border(context, box, enable_hinting)
         if isinstance(box, (boxes.InlineBox, boxes.LineBox)):
             for child in box.children:
                 if isinstance(child, boxes.TextBox):
                     draw_text(context, child, enable_hinting)
                 else:
-                    draw_inline_level(context, page, child, enable_hinting)
+                    draw_inline_level(
+                        context, page, child, enable_hinting, embed_jpeg)
         elif isinstance(box, boxes.InlineReplacedBox):
-            draw_replacedbox(context, box)
+            draw_replacedbox(context, box, embed_jpeg)
         else:
             assert isinstance(box, boxes.TextBox)
             # Should only happen for list markers
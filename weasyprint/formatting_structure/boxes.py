@@ -65,27 +65,91 @@ from ..compat import unichr, xrange
 from ..css.computed_values import ZERO_PIXELS
 
 
+# Functions initializing and copying the slots of each box class, built the
+# first time that a box of this class is created.
+SLOT_FUNCTIONS = {}
+
+
+def slot_functions(cls):
+    """Return the ``(init_slots, copy_slots)`` functions of a box class.
+
+    ``init_slots(box)`` sets all the slots of ``box`` to their default
+    values, given by the ``slot_defaults`` of the classes or ``None``.
+    ``copy_slots(box, new_box)`` copies all the slots of ``box`` to
+    ``new_box``. Both functions are compiled with an assignment for each
+    slot, which is much faster than ``getattr`` and ``setattr`` in a loop.
+
+    """
+    functions = SLOT_FUNCTIONS.get(cls)
+    if functions is None:
+        names = []
+        defaults = {}
+        for base in reversed(cls.__mro__):
+            names.extend(
+                name for name in base.__dict__.get('__slots__', ())
+                if name != '__weakref__')
+            defaults.update(base.__dict__.get('slot_defaults', {}))
+        namespace = {'values': tuple(defaults.get(name) for name in names)}
+        exec(
+            'def init_slots(box):\n'
+            '    %s = values\n'
+            'def copy_slots(box, new_box):\n'
+            '%s\n' % (
+                ''.join('box.%s, ' % name for name in names),
+                '\n'.join('    new_box.%s = box.%s' % (name, name)
+                          for name in names)),
+            namespace)
+        functions = SLOT_FUNCTIONS[cls] = (
+            namespace['init_slots'], namespace['copy_slots'])
+    return functions
+
+
 # The *Box classes have many attributes and methods, but that's the way it is
 # pylint: disable=R0904,R0902
 
 class Box(object):
     """Abstract base class for all boxes."""
+    # Boxes have no dictionary, their attributes are all stored in slots.
+    # The used values are set by the layout, other attributes are set by the
+    # layout or when the box tree is built.
+    __slots__ = (
+        'element_tag', 'sourceline', 'style',
+        'position_x', 'position_y', 'width', 'height',
+        'min_width', 'max_width', 'min_height', 'max_height',
+        'margin_top', 'margin_right', 'margin_bottom', 'margin_left',
+        'padding_top', 'padding_right', 'padding_bottom', 'padding_left',
+        'border_top_width', 'border_right_width', 'border_bottom_width',
+        'border_left_width', 'border_top_left_radius',
+        'border_top_right_radius', 'border_bottom_right_radius',
+        'border_bottom_left_radius', 'top', 'right', 'bottom', 'left',
+        'baseline', 'clearance', 'background', 'index',
+        'is_table_wrapper', 'is_for_root_element', 'is_attachment',
+        'transformation_matrix', 'viewport_overflow',
+        '__weakref__')
+
+    # Default values of the slots, may be overriden on instances.
+    slot_defaults = {
+        'is_table_wrapper': False,
+        'is_for_root_element': False,
+        'is_attachment': False,
+    }
+
     # Definitions for the rules generating anonymous table boxes
     # http://www.w3.org/TR/CSS21/tables.html#anonymous-boxes
     proper_table_child = False
     internal_table_or_caption = False
     tabular_container = False
 
-    # Default, may be overriden on instances.
-    is_table_wrapper = False
-    is_for_root_element = False
-    transformation_matrix = None
-
     # Default, overriden on some subclasses
     def all_children(self):
         return ()
 
     def __init__(self, element_tag, sourceline, style):
+        # Set all the slots to their defaults. Unset attributes read as None
+        # (or as their value in slot_defaults) instead of raising
+        # AttributeError: a layout bug reading a position that is not set yet
+        # does not fail loudly anymore.
+        slot_functions(type(self))[0](self)
         self.element_tag = element_tag
         self.sourceline = sourceline  # for debugging only
         # Copying might not be needed, but let’s be careful with mutable
@@ -110,10 +174,14 @@ class Box(object):
         # styles may be kinda expensive, no need to do it again.
         new_box = cls.__new__(cls)
         # Copy attributes
-        new_box.__dict__.update(self.__dict__)
+        slot_functions(cls)[1](self, new_box)
         new_box.style = self.style.copy()
         return new_box
 
+    def deepcopy(self):
+        """Return a copy of the box with recursive copies of its children."""
+        return self.copy()
+
     def translate(self, dx=0, dy=0):
         """Change the box’s position.
 
@@ -279,6 +347,8 @@ class Box(object):
 
 class ParentBox(Box):
     """A box that has children."""
+    __slots__ = ('children', 'outside_list_marker')
+
     def __init__(self, element_tag, sourceline, style, children):
         super(ParentBox, self).__init__(element_tag, sourceline, style)
         self.children = tuple(children)
@@ -320,6 +390,11 @@ class ParentBox(Box):
         new_box._remove_decoration(not is_start, not is_end)
         return new_box
 
+    def deepcopy(self):
+        result = self.copy()
+        result.children = tuple(child.deepcopy() for child in self.children)
+        return result
+
     def descendants(self):
         """A flat generator for a box, its children and descendants."""
         yield self
@@ -347,7 +422,7 @@ class BlockLevelBox(Box):
     ``table`` generates a block-level box.
 
     """
-    clearance = None
+    __slots__ = ()
 
 
 class BlockContainerBox(ParentBox):
@@ -361,6 +436,7 @@ class BlockContainerBox(ParentBox):
     box.
 
     """
+    __slots__ = ()
 
 
 class BlockBox(BlockContainerBox, BlockLevelBox):
@@ -370,12 +446,21 @@ class BlockBox(BlockContainerBox, BlockLevelBox):
     generates a block box.
 
     """
+    __slots__ = ()
+
     # TODO: remove this when outside list marker are absolute children
     def all_children(self):
         marker = getattr(self, 'outside_list_marker', None)
         return (itertools.chain(self.children, [marker])
                 if marker else self.children)
 
+    def deepcopy(self):
+        result = super(BlockBox, self).deepcopy()
+        marker = getattr(self, 'outside_list_marker', None)
+        if marker:
+            result.outside_list_marker = marker.deepcopy()
+        return result
+
 
 class LineBox(ParentBox):
     """A box that represents a line in an inline formatting context.
@@ -387,6 +472,8 @@ class LineBox(ParentBox):
     be split into multiple line boxes, one for each actual line.
 
     """
+    __slots__ = ('text_indent', 'resume_at')
+
     def __init__(self, element_tag, sourceline, style, children):
         assert style.anonymous
         super(LineBox, self).__init__(element_tag, sourceline, style, children)
@@ -402,6 +489,8 @@ class InlineLevelBox(Box):
     ``inline-block`` generates an inline-level box.
 
     """
+    __slots__ = ()
+
     def _remove_decoration(self, start, end):
         ltr = self.style.direction == 'ltr'
         if start:
@@ -420,6 +509,8 @@ class InlineBox(InlineLevelBox, ParentBox):
     inline box.
 
     """
+    __slots__ = ()
+
     def hit_area(self):
         """Return the (x, y, w, h) rectangle where the box is clickable."""
         # Use line-height (margin_height) rather than border_height
@@ -434,6 +525,8 @@ class TextBox(InlineLevelBox):
     inline boxes" are also text boxes.
 
     """
+    __slots__ = ('text', 'pango_layout', '_utf8_offsets')
+
     # http://stackoverflow.com/questions/16317534/
     ascii_to_wide = dict((i, unichr(i + 0xfee0)) for i in range(0x21, 0x7f))
     ascii_to_wide.update({0x20: '\u3000', 0x2D: '\u2212'})
@@ -462,6 +555,38 @@ class TextBox(InlineLevelBox):
         new_box.text = text
         return new_box
 
+    def utf8_offsets(self):
+        """Return the offsets in UTF-8 bytes of the characters of ``text``.
+
+        The list has an item for each character, plus one for the end of the
+        text. ``None`` is returned if the text only contains ASCII characters,
+        as their offsets are their indexes. The list is built once for each
+        text, as long texts are split many times by the line breaking.
+
+        """
+        text = self.text
+        cached = self._utf8_offsets
+        if cached is not None and cached[0] is text:
+            return cached[1]
+        if len(text.encode('utf8')) == len(text):
+            offsets = None
+        else:
+            offsets = [0]
+            offset = 0
+            for character in text:
+                code_point = ord(character)
+                if code_point < 0x80:
+                    offset += 1
+                elif code_point < 0x800:
+                    offset += 2
+                elif code_point < 0x10000:
+                    offset += 3
+                else:
+                    offset += 4
+                offsets.append(offset)
+        self._utf8_offsets = (text, offsets)
+        return offsets
+
 
 class AtomicInlineLevelBox(InlineLevelBox):
     """An atomic box in an inline formatting context.
@@ -469,6 +594,7 @@ class AtomicInlineLevelBox(InlineLevelBox):
     This inline-level box cannot be split for line breaks.
 
     """
+    __slots__ = ()
 
 
 class InlineBlockBox(AtomicInlineLevelBox, BlockContainerBox):
@@ -480,6 +606,7 @@ class InlineBlockBox(AtomicInlineLevelBox, BlockContainerBox):
     an inline-block box.
 
     """
+    __slots__ = ()
 
 
 class ReplacedBox(Box):
@@ -489,6 +616,10 @@ class ReplacedBox(Box):
     and is opaque from CSS’s point of view.
 
     """
+    __slots__ = ('replacement', 'is_list_marker')
+
+    slot_defaults = {'is_list_marker': False}
+
     def __init__(self, element_tag, sourceline, style, replacement):
         super(ReplacedBox, self).__init__(element_tag, sourceline, style)
         self.replacement = replacement
@@ -501,6 +632,7 @@ class BlockReplacedBox(ReplacedBox, BlockLevelBox):
     ``table`` generates a block-level replaced box.
 
     """
+    __slots__ = ()
 
 
 class InlineReplacedBox(ReplacedBox, AtomicInlineLevelBox):
@@ -511,10 +643,15 @@ class InlineReplacedBox(ReplacedBox, AtomicInlineLevelBox):
     box.
 
     """
+    __slots__ = ()
 
 
 class TableBox(BlockLevelBox, ParentBox):
     """Box for elements with ``display: table``"""
+    __slots__ = (
+        'column_groups', 'column_positions', 'column_widths',
+        'collapsed_border_grid', 'skipped_rows')
+
     # Definitions for the rules generating anonymous table boxes
     # http://www.w3.org/TR/CSS21/tables.html#anonymous-boxes
     tabular_container = True
@@ -522,6 +659,12 @@ class TableBox(BlockLevelBox, ParentBox):
     def all_children(self):
         return itertools.chain(self.children, self.column_groups)
 
+    def deepcopy(self):
+        result = super(TableBox, self).deepcopy()
+        result.column_groups = tuple(
+            group.deepcopy() for group in self.column_groups)
+        return result
+
     def translate(self, dx=0, dy=0):
         self.column_positions = [
             position + dx for position in self.column_positions]
@@ -530,22 +673,26 @@ class TableBox(BlockLevelBox, ParentBox):
 
 class InlineTableBox(TableBox):
     """Box for elements with ``display: inline-table``"""
+    __slots__ = ()
 
 
 class TableRowGroupBox(ParentBox):
     """Box for elements with ``display: table-row-group``"""
+    __slots__ = ('is_header', 'is_footer')
+
+    # Default values. May be overriden on instances.
+    slot_defaults = {'is_header': False, 'is_footer': False}
+
     proper_table_child = True
     internal_table_or_caption = True
     tabular_container = True
     proper_parents = (TableBox, InlineTableBox)
 
-    # Default values. May be overriden on instances.
-    is_header = False
-    is_footer = False
-
 
 class TableRowBox(ParentBox):
     """Box for elements with ``display: table-row``"""
+    __slots__ = ()
+
     proper_table_child = True
     internal_table_or_caption = True
     tabular_container = True
@@ -554,24 +701,26 @@ class TableRowBox(ParentBox):
 
 class TableColumnGroupBox(ParentBox):
     """Box for elements with ``display: table-column-group``"""
+    __slots__ = ('span', 'grid_x')
+
+    slot_defaults = {
+        # Default value. May be overriden on instances.
+        'span': 1,
+        # Columns groups never have margins or paddings
+        'margin_top': 0,
+        'margin_bottom': 0,
+        'margin_left': 0,
+        'margin_right': 0,
+        'padding_top': 0,
+        'padding_bottom': 0,
+        'padding_left': 0,
+        'padding_right': 0,
+    }
+
     proper_table_child = True
     internal_table_or_caption = True
     proper_parents = (TableBox, InlineTableBox)
 
-    # Default value. May be overriden on instances.
-    span = 1
-
-    # Columns groups never have margins or paddings
-    margin_top = 0
-    margin_bottom = 0
-    margin_left = 0
-    margin_right = 0
-
-    padding_top = 0
-    padding_bottom = 0
-    padding_left = 0
-    padding_right = 0
-
     def get_cells(self):
         """Return cells that originate in the group's columns."""
         return [
@@ -581,44 +730,46 @@ class TableColumnGroupBox(ParentBox):
 # Not really a parent box, but pretending to be removes some corner cases.
 class TableColumnBox(ParentBox):
     """Box for elements with ``display: table-column``"""
+    __slots__ = ('span', 'grid_x', 'get_cells')
+
+    slot_defaults = {
+        # Default value. May be overriden on instances.
+        'span': 1,
+        # Function returning the cells that originate in the column, no
+        # cells until the layout of the table overrides it on instances.
+        'get_cells': list,
+        # Columns never have margins or paddings
+        'margin_top': 0,
+        'margin_bottom': 0,
+        'margin_left': 0,
+        'margin_right': 0,
+        'padding_top': 0,
+        'padding_bottom': 0,
+        'padding_left': 0,
+        'padding_right': 0,
+    }
+
     proper_table_child = True
     internal_table_or_caption = True
     proper_parents = (TableBox, InlineTableBox, TableColumnGroupBox)
 
-    # Default value. May be overriden on instances.
-    span = 1
-
-    # Columns never have margins or paddings
-    margin_top = 0
-    margin_bottom = 0
-    margin_left = 0
-    margin_right = 0
-
-    padding_top = 0
-    padding_bottom = 0
-    padding_left = 0
-    padding_right = 0
-
-    def get_cells(self):
-        """Return cells that originate in the column.
-
-        May be overriden on instances.
-
-        """
-        return []
-
 
 class TableCellBox(BlockContainerBox):
     """Box for elements with ``display: table-cell``"""
-    internal_table_or_caption = True
+    __slots__ = (
+        'colspan', 'rowspan', 'grid_x', 'computed_height', 'content_height',
+        'empty', 'vertical_align')
 
     # Default values. May be overriden on instances.
-    colspan = 1
-    rowspan = 1
+    slot_defaults = {'colspan': 1, 'rowspan': 1}
+
+    internal_table_or_caption = True
 
 
 class TableCaptionBox(BlockBox):
     """Box for elements with ``display: table-caption``"""
+    __slots__ = ()
+
     proper_table_child = True
     internal_table_or_caption = True
     proper_parents = (TableBox, InlineTableBox)
@@ -631,11 +782,13 @@ class PageBox(ParentBox):
     During layout a new page box is created after every page break.
 
     """
+    __slots__ = ('page_type', 'canvas_background', 'fixed_boxes')
+
     def __init__(self, page_type, style):
-        self.page_type = page_type
         # Page boxes are not linked to any element.
         super(PageBox, self).__init__(
             element_tag=None, sourceline=None, style=style, children=[])
+        self.page_type = page_type
 
     def __repr__(self):
         return '<%s %s>' % (type(self).__name__, self.page_type)
@@ -643,11 +796,13 @@ class PageBox(ParentBox):
 
 class MarginBox(BlockContainerBox):
     """Box in page margins, as defined in CSS3 Paged Media"""
+    __slots__ = ('at_keyword', 'is_generated')
+
     def __init__(self, at_keyword, style, children=[]):
-        self.at_keyword = at_keyword
         # Margin boxes are not linked to any element.
         super(MarginBox, self).__init__(
             element_tag=None, sourceline=None, style=style, children=children)
+        self.at_keyword = at_keyword
 
     def __repr__(self):
         return '<%s %s>' % (type(self).__name__, self.at_keyword)
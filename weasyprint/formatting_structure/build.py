@@ -124,6 +124,9 @@ def element_to_box(element, style_for, get_image_from_uri, state=None):
     if display == 'none':
         return []
 
+    # Computed styles may be shared between elements, boxes get a cheap
+    # copy-on-write copy that can be modified.
+    style = style.copy()
     box = make_box(element.tag, element.sourceline, style, [],
                    get_image_from_uri)
 
@@ -174,7 +177,7 @@ def element_to_box(element, style_for, get_image_from_uri, state=None):
             counter_values.pop(name)
 
     box = box.copy_with_children(children)
-    replace_content_lists(element, box, style, counter_values)
+    replace_content_lists(element, box, counter_values)
 
     # Specific handling for the element. (eg. replaced element)
     return html.handle_element(element, box, get_image_from_uri)
@@ -195,6 +198,7 @@ def pseudo_to_box(element, pseudo_type, state, style_for, get_image_from_uri):
     if 'none' in (display, content) or content == 'normal':
         return
 
+    style = style.copy()
     box = make_box(
         '%s:%s' % (element.tag, pseudo_type), element.sourceline, style, [],
         get_image_from_uri)
@@ -282,13 +286,14 @@ def compute_content_list_string(element, box, counter_values, content_list):
     return string
 
 
-def replace_content_lists(element, box, style, counter_values):
+def replace_content_lists(element, box, counter_values):
     """Replace the content-lists by strings.
 
     These content-lists are used in GCPM properties like ``string-set`` and
     ``bookmark-label``.
 
     """
+    style = box.style
     string_set = []
     if style.string_set != 'none':
         for i, (string_name, string_values) in enumerate(style.string_set):
@@ -354,7 +359,8 @@ def add_box_marker(box, counter_values, get_image_from_uri):
     image_type, image = style.list_style_image
     if image_type == 'url':
         # surface may be None here too, in case the image is not available.
-        image = get_image_from_uri(image)
+        # It is decoded now to fall back to the list-style-type.
+        image = get_image_from_uri(image, decode=True)
 
     if image is None:
         type_ = style.list_style_type
@@ -20,6 +20,7 @@ import os.path
 import logging
 import sys
 import re
+import threading
 
 from .css import get_child_text
 from .formatting_structure import boxes
@@ -29,18 +30,33 @@ from .logger import LOGGER
 from . import CSS
 
 
-# XXX temporarily disable logging for user-agent stylesheet
-level = LOGGER.level
-LOGGER.setLevel(logging.ERROR)
-
 if hasattr(sys, "frozen"):
     root = os.path.dirname(sys.executable)
 else:
     root = os.path.dirname(__file__)
-HTML5_UA_STYLESHEET = CSS(filename=os.path.join(root, 'css', 'html5_ua.css'))
-HTML5_PH_STYLESHEET = CSS(filename=os.path.join(root, 'css', 'html5_ph.css'))
 
-LOGGER.setLevel(level)
+# User-agent stylesheets, parsed on first use by get_ua_stylesheet().
+# keys: file names in the css directory, values: CSS objects
+UA_STYLESHEETS = {}
+UA_STYLESHEETS_LOCK = threading.Lock()
+
+
+def get_ua_stylesheet(basename):
+    """Return the user-agent stylesheet in the ``css/basename`` file."""
+    stylesheet = UA_STYLESHEETS.get(basename)
+    if stylesheet is None:
+        with UA_STYLESHEETS_LOCK:
+            stylesheet = UA_STYLESHEETS.get(basename)
+            if stylesheet is None:
+                # XXX temporarily disable logging for user-agent stylesheet
+                level = LOGGER.level
+                LOGGER.setLevel(logging.ERROR)
+                try:
+                    stylesheet = UA_STYLESHEETS[basename] = CSS(
+                        filename=os.path.join(root, 'css', basename))
+                finally:
+                    LOGGER.setLevel(level)
+    return stylesheet
 
 
 # http://whatwg.org/C#space-character
@@ -132,7 +148,8 @@ def handle_img(element, box, get_image_from_uri):
     src = get_url_attribute(element, 'src')
     alt = element.get('alt')
     if src:
-        image = get_image_from_uri(src)
+        # Decode the image now if it has an alt-text to fall back to
+        image = get_image_from_uri(src, decode=bool(alt))
         if image is not None:
             return [make_replaced_box(element, box, image)]
         else:
@@ -184,7 +201,8 @@ def handle_object(element, box, get_image_from_uri):
     data = get_url_attribute(element, 'data')
     type_ = element.get('type', '').strip()
     if data:
-        image = get_image_from_uri(data, type_)
+        # Decode the image now, the children are the fallback
+        image = get_image_from_uri(data, type_, decode=True)
         if image is not None:
             return [make_replaced_box(element, box, image)]
     # The element’s children are the fallback.
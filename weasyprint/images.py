@@ -14,14 +14,16 @@ from __future__ import division, unicode_literals
 
 from io import BytesIO
 from xml.etree import ElementTree
+import functools
 import math
+import os
+import struct
 
 import cairocffi
-import cairosvg.parser
-import cairosvg.surface
 
 from .urls import fetch, URLFetchingError
 from .logger import LOGGER
+from .lru import LRUCache
 from .compat import xrange
 
 try:
@@ -29,11 +31,6 @@ try:
 except OSError:
     pixbuf = None
 
-assert cairosvg.surface.cairo is cairocffi, (
-    'CairoSVG is using pycairo instead of cairocffi. '
-    'Make sure it is not imported before WeasyPrint.')
-
-
 CAIRO_HAS_MIME_DATA = cairocffi.cairo_version() >= 11000
 
 # Map values of the image-rendering property to cairo FILTER values:
@@ -44,6 +41,10 @@ IMAGE_RENDERING_TO_FILTER = {
     'pixelated': cairocffi.FILTER_NEAREST,
 }
 
+# Markers of the JPEG segments including the size of the image
+JPEG_START_OF_FRAME_MARKERS = frozenset(
+    range(0xc0, 0xd0)) - frozenset((0xc4, 0xc8, 0xcc))
+
 
 class ImageLoadingError(ValueError):
     """An error occured when loading an image.
@@ -60,41 +61,194 @@ class ImageLoadingError(ValueError):
 
 
 class RasterImage(object):
-    def __init__(self, image_surface):
-        self.image_surface = image_surface
-        self._intrinsic_width = image_surface.get_width()
-        self._intrinsic_height = image_surface.get_height()
+    """A raster image.
+
+    ``image_surface`` is a cairo image surface, or a function decoding the
+    image and returning its surface, or :obj:`None` if the image is invalid.
+    This function is only called when the image is drawn, its
+    ``intrinsic_size`` in pixels must then be given.
+
+    ``jpeg_string`` is the data of JPEG images decoded by this function.
+    When they are drawn in PDF documents, this data is embedded as is and
+    the images are not decoded.
+
+    """
+    def __init__(self, image_surface, intrinsic_size=None, jpeg_string=None):
+        if intrinsic_size is None:
+            self._image_surface = image_surface
+            self._decode = None
+            intrinsic_size = (
+                image_surface.get_width(), image_surface.get_height())
+        else:
+            self._image_surface = None
+            self._decode = image_surface
+        self._jpeg_string = jpeg_string
+        self._jpeg_surface = None
+        self._intrinsic_width, self._intrinsic_height = intrinsic_size
         self.intrinsic_ratio = (
             self._intrinsic_width / self._intrinsic_height
             if self._intrinsic_height != 0 else float('inf'))
 
+    @property
+    def image_surface(self):
+        """The decoded image surface, or :obj:`None` for invalid images."""
+        if self._decode is not None:
+            self._image_surface = self._decode()
+            self._decode = None
+        return self._image_surface
+
+    def get_jpeg_surface(self):
+        """Return a surface only including the JPEG data of the image.
+
+        The pixels of the surface are not decoded, the surface can only be
+        drawn by cairo backends using the JPEG data, such as PDF.
+
+        """
+        if self._jpeg_surface is None:
+            self._jpeg_surface = cairocffi.ImageSurface(
+                cairocffi.FORMAT_RGB24, self._intrinsic_width,
+                self._intrinsic_height)
+            self._jpeg_surface.set_mime_data('image/jpeg', self._jpeg_string)
+        return self._jpeg_surface
+
     def get_intrinsic_size(self, image_resolution, _font_size):
         # Raster images are affected by the 'image-resolution' property.
         return (self._intrinsic_width / image_resolution,
                 self._intrinsic_height / image_resolution)
 
-    def draw(self, context, concrete_width, concrete_height, image_rendering):
+    def draw(self, context, concrete_width, concrete_height, image_rendering,
+             embed_jpeg=False):
         if concrete_width > 0 and concrete_height > 0 and \
                 self._intrinsic_width > 0 and self._intrinsic_height > 0:
-            # Use the real intrinsic size here,
+            if (embed_jpeg and self._decode is not None and
+                    self._jpeg_string is not None):
+                image_surface = self.get_jpeg_surface()
+            else:
+                image_surface = self.image_surface
+            if image_surface is None:
+                return
+            # Use the real size of the surface here,
             # not affected by 'image-resolution'.
-            context.scale(concrete_width / self._intrinsic_width,
-                          concrete_height / self._intrinsic_height)
-            context.set_source_surface(self.image_surface)
+            context.scale(concrete_width / image_surface.get_width(),
+                          concrete_height / image_surface.get_height())
+            context.set_source_surface(image_surface)
             context.get_source().set_filter(
                 IMAGE_RENDERING_TO_FILTER[image_rendering])
             context.paint()
 
 
-class ScaledSVGSurface(cairosvg.surface.SVGSurface):
+def get_raster_size(string):
+    """Read the size of a PNG, JPEG or GIF image in its header.
+
+    :returns:
+        A ``(format_name, (width, height))`` tuple, or :obj:`None` if the
+        format is unknown or if the size can not be found.
+
     """
-    Have the cairo Surface object have intrinsic dimension
-    in pixels instead of points.
+    if string[:8] == b'\x89PNG\r\n\x1a\n' and string[12:16] == b'IHDR':
+        if len(string) >= 24:
+            return 'png', struct.unpack_from('>II', string, 16)
+    elif string[:6] in (b'GIF87a', b'GIF89a'):
+        if len(string) >= 10:
+            return 'gif', struct.unpack_from('<HH', string, 6)
+    elif string[:2] == b'\xff\xd8':
+        size = get_jpeg_size(string)
+        if size is not None:
+            return 'jpeg', size
+
+
+def get_jpeg_size(string):
+    """Read the size of a JPEG image in its start of frame segment."""
+    position = 2
+    while position + 4 <= len(string):
+        byte, marker = struct.unpack_from('BB', string, position)
+        if byte != 0xff:
+            return None
+        if marker == 0xff:
+            # Fill byte
+            position += 1
+            continue
+        position += 2
+        if marker == 0x01 or 0xd0 <= marker <= 0xd8:
+            # Marker without segment
+            continue
+        if marker in (0xd9, 0xda):
+            # End of image or start of scan
+            return None
+        if marker in JPEG_START_OF_FRAME_MARKERS:
+            if position + 7 > len(string):
+                return None
+            height, width = struct.unpack_from('>HH', string, position + 3)
+            # A height of 0 is given later in the image
+            return (width, height) if width and height else None
+        segment_length, = struct.unpack_from('>H', string, position)
+        position += segment_length
+
+
+def decode_raster_image(url, string, format_name):
+    """Decode a PNG, JPEG or GIF image and return its surface.
+
+    Log a warning and return :obj:`None` if the image is invalid.
+
     """
-    @property
-    def device_units_per_user_units(self):
-        scale = super(ScaledSVGSurface, self).device_units_per_user_units
-        return scale / 0.75
+    try:
+        return decode_to_image_surface(string, format_name)
+    except ImageLoadingError as exc:
+        LOGGER.warning('Failed to load image at "%s" (%s)', url, exc)
+
+
+def decode_to_image_surface(string, format_name=None):
+    """Decode an image and return its surface.
+
+    PNG images are decoded by cairo, other images and PNG images that cairo
+    can not decode are given to GDK-Pixbuf.
+
+    """
+    if format_name == 'png':
+        try:
+            return cairocffi.ImageSurface.create_from_png(BytesIO(string))
+        except Exception:
+            pass
+    if pixbuf is None:
+        raise ImageLoadingError(
+            'Could not load GDK-Pixbuf. PNG and SVG are '
+            'the only image formats available.')
+    try:
+        surface, format_name = pixbuf.decode_to_image_surface(string)
+    except pixbuf.ImageLoadingError as exception:
+        raise ImageLoadingError(str(exception))
+    if format_name == 'jpeg' and CAIRO_HAS_MIME_DATA:
+        surface.set_mime_data('image/jpeg', string)
+    return surface
+
+
+# CairoSVG is imported with the first SVG image, see import_cairosvg()
+cairosvg = None
+ScaledSVGSurface = None
+
+
+def import_cairosvg():
+    """Import CairoSVG, if not done yet."""
+    global cairosvg, ScaledSVGSurface
+    if ScaledSVGSurface is not None:
+        return
+
+    import cairosvg.parser
+    import cairosvg.surface
+
+    assert cairosvg.surface.cairo is cairocffi, (
+        'CairoSVG is using pycairo instead of cairocffi. '
+        'Make sure it is not imported before WeasyPrint.')
+
+    class ScaledSVGSurface(cairosvg.surface.SVGSurface):
+        """
+        Have the cairo Surface object have intrinsic dimension
+        in pixels instead of points.
+        """
+        @property
+        def device_units_per_user_units(self):
+            scale = super(ScaledSVGSurface, self).device_units_per_user_units
+            return scale / 0.75
 
 
 class FakeSurface(object):
@@ -118,6 +272,8 @@ class SVGImage(object):
         except Exception as e:
             raise ImageLoadingError.from_exception(e)
 
+        import_cairosvg()
+
     def get_intrinsic_size(self, _image_resolution, font_size):
         # Vector images may be affected by the font size.
         fake_surface = FakeSurface()
@@ -149,7 +305,8 @@ class SVGImage(object):
             self.intrinsic_ratio = self._width / self._height
         return self._intrinsic_width, self._intrinsic_height
 
-    def draw(self, context, concrete_width, concrete_height, _image_rendering):
+    def draw(self, context, concrete_width, concrete_height, _image_rendering,
+             _embed_jpeg=False):
         try:
             svg = ScaledSVGSurface(
                 cairosvg.parser.Tree(
@@ -166,13 +323,57 @@ class SVGImage(object):
                 'Failed to draw an SVG image at %s : %s', self._base_url, e)
 
 
-def get_image_from_uri(cache, url_fetcher, url, forced_mime_type=None):
-    """Get a cairo Pattern from an image URI."""
+def get_image_bytes(image):
+    """Return the approximate memory used by ``image``, in bytes."""
+    if isinstance(image, RasterImage):
+        # Size of the decoded surface, even if the image is not decoded yet
+        return image._intrinsic_width * image._intrinsic_height * 4
+    else:
+        return len(image._svg_data)
+
+
+#: Images shared by all the documents rendered in the process, keyed by their
+#: URL, URL fetcher and forced MIME type. Images are only cached when
+#: ``IMAGE_CACHE.max_bytes``, the memory that they can use in bytes, is set
+#: here or with the ``WEASYPRINT_IMAGE_CACHE_SIZE`` environment variable
+#: before importing WeasyPrint. The ``hits`` and ``misses`` attributes of the
+#: cache count lookups. It can be replaced by any object with the ``get`` and
+#: ``__setitem__`` methods of dictionaries.
+IMAGE_CACHE = LRUCache(
+    max_bytes=int(os.environ.get('WEASYPRINT_IMAGE_CACHE_SIZE') or 0),
+    get_bytes=get_image_bytes)
+
+
+def get_image_from_uri(cache, url_fetcher, url, forced_mime_type=None,
+                       decode=False):
+    """Get a cairo Pattern from an image URI.
+
+    Raster images are decoded when they are drawn, or now if ``decode`` is
+    true: :obj:`None` is then returned for images that can not be decoded,
+    so that the element can use its fallback content instead.
+
+    """
+    image = load_image(cache, url_fetcher, url, forced_mime_type)
+    if decode and isinstance(image, RasterImage) and (
+            image.image_surface is None):
+        return None
+    return image
+
+
+def load_image(cache, url_fetcher, url, forced_mime_type):
+    """Fetch an image, or get it from the caches, and return it."""
     missing = object()
     image = cache.get(url, missing)
     if image is not missing:
         return image
 
+    # Images that could not be loaded are not shared between documents
+    shared_key = (url, url_fetcher, forced_mime_type)
+    image = IMAGE_CACHE.get(shared_key)
+    if image is not None:
+        cache[url] = image
+        return image
+
     try:
         with fetch(url_fetcher, url) as result:
             if 'string' in result:
@@ -185,38 +386,25 @@ def get_image_from_uri(cache, url_fetcher, url, forced_mime_type=None):
                 # Sniffing Standard, see https://mimesniff.spec.whatwg.org/
                 image = SVGImage(string, url)
             else:
-                # Try to rely on given mimetype
-                try:
-                    if mime_type == 'image/png':
-                        try:
-                            surface = cairocffi.ImageSurface.create_from_png(
-                                BytesIO(string))
-                        except Exception as exception:
-                            raise ImageLoadingError.from_exception(exception)
-                        else:
-                            image = RasterImage(surface)
-                    else:
-                        image = None
-                except ImageLoadingError:
-                    image = None
-
-                # Relying on mimetype didn't work, give the image to GDK-Pixbuf
-                if not image:
-                    if pixbuf is None:
-                        raise ImageLoadingError(
-                            'Could not load GDK-Pixbuf. PNG and SVG are '
-                            'the only image formats available.')
-                    try:
-                        surface, format_name = (
-                            pixbuf.decode_to_image_surface(string))
-                    except pixbuf.ImageLoadingError as exception:
-                        raise ImageLoadingError(str(exception))
+                raster_size = get_raster_size(string)
+                if raster_size is not None and (
+                        raster_size[0] == 'png' or pixbuf is not None):
+                    # Only decode the image when it is drawn
+                    format_name, intrinsic_size = raster_size
+                    jpeg_string = None
                     if format_name == 'jpeg' and CAIRO_HAS_MIME_DATA:
-                        surface.set_mime_data('image/jpeg', string)
-                    image = RasterImage(surface)
+                        jpeg_string = string
+                    image = RasterImage(functools.partial(
+                        decode_raster_image, url, string, format_name),
+                        intrinsic_size, jpeg_string)
+                else:
+                    image = RasterImage(decode_to_image_surface(
+                        string, 'png' if mime_type == 'image/png' else None))
     except (URLFetchingError, ImageLoadingError) as exc:
         LOGGER.warning('Failed to load image at "%s" (%s)', url, exc)
         image = None
+    else:
+        IMAGE_CACHE[shared_key] = image
     cache[url] = image
     return image
 
@@ -334,7 +522,8 @@ class Gradient(object):
 
     intrinsic_ratio = None
 
-    def draw(self, context, concrete_width, concrete_height, _image_rendering):
+    def draw(self, context, concrete_width, concrete_height, _image_rendering,
+             _embed_jpeg=False):
         scale_y, type_, init, stop_positions, stop_colors = self.layout(
             concrete_width, concrete_height, context.user_to_device_distance)
         context.scale(1, scale_y)
@@ -19,12 +19,15 @@
 
 """
 from __future__ import division, unicode_literals
+import weakref
 from collections import defaultdict
 from ..compat import xrange
+from ..css import PAGE_PSEUDOCLASS_TARGETS
 
 from .absolute import absolute_box_layout
-from .pages import make_all_pages, make_margin_boxes
+from .pages import make_all_pages, make_margin_boxes, MARGIN_BOX_AT_KEYWORDS
 from .backgrounds import layout_backgrounds
+from .float import ExcludedShapes
 
 
 def layout_fixed_boxes(context, pages):
@@ -37,26 +40,62 @@ def layout_fixed_boxes(context, pages):
             yield absolute_box_layout(context, box, page, [])
 
 
-def layout_document(enable_hinting, style_for, get_image_from_uri, root_box):
+def layout_document(enable_hinting, style_for, get_image_from_uri, root_box,
+                    streaming=False, jobs=1):
     """Lay out the whole document.
 
     This includes line breaks, page breaks, absolute size and position for all
     boxes.
 
     :param context: a LayoutContext object.
-    :returns: a list of laid out Page objects.
+    :param streaming:
+        Whether pages are yielded as soon as they are laid out, without
+        keeping references to the previous pages. When the total number of
+        pages or fixed boxes are needed, a first pass lays out the whole
+        document and only keeps them.
+    :param jobs:
+        The number of processes laying out the parts of the document
+        separated by forced page breaks. Ignored when ``streaming`` is true.
+    :returns:
+        A generator of the laid out page boxes. Unless ``streaming`` is
+        true, all the pages are laid out before the first one is yielded.
 
     """
     context = LayoutContext(enable_hinting, style_for, get_image_from_uri)
-    pages = list(make_all_pages(context, root_box))
+    if not streaming:
+        if jobs > 1:
+            # multiprocessing is only imported when needed
+            from .parallel import make_all_pages_in_parallel
+            pages = make_all_pages_in_parallel(context, root_box, jobs)
+        else:
+            pages = list(make_all_pages(context, root_box))
+        pages_count = len(pages)
+        # The fixed boxes of each page are repeated on the other pages. Their
+        # layout only depends on the page they come from: lay them out once,
+        # and give copies to the other pages, as backgrounds are set for each
+        # page.
+        fixed_boxes = [
+            (i, box) for i, page in enumerate(pages)
+            for box in layout_fixed_boxes(context, [page])]
+    elif uses_pages_count(style_for) or has_fixed_boxes(root_box):
+        pages_count, fixed_boxes = count_pages(
+            enable_hinting, style_for, get_image_from_uri, root_box)
+        pages = make_all_pages(context, root_box)
+    else:
+        # counter(pages) is never displayed
+        pages_count = 0
+        fixed_boxes = []
+        pages = make_all_pages(context, root_box)
     page_counter = [1]
-    counter_values = {'page': page_counter, 'pages': [len(pages)]}
+    counter_values = {'page': page_counter, 'pages': [pages_count]}
     for i, page in enumerate(pages):
         root_children = []
         root, = page.children
-        root_children.extend(layout_fixed_boxes(context, pages[:i]))
+        root_children.extend(
+            box.deepcopy() for j, box in fixed_boxes if j < i)
         root_children.extend(root.children)
-        root_children.extend(layout_fixed_boxes(context, pages[i+1:]))
+        root_children.extend(
+            box.deepcopy() for j, box in fixed_boxes if j > i)
         root = root.copy_with_children(root_children)
         context.current_page = page_counter[0]
         page.children = (root,) + tuple(
@@ -66,6 +105,43 @@ def layout_document(enable_hinting, style_for, get_image_from_uri, root_box):
         page_counter[0] += 1
 
 
+def count_pages(enable_hinting, style_for, get_image_from_uri, root_box):
+    """Lay out the document without keeping its pages.
+
+    :returns:
+        A ``(pages_count, fixed_boxes)`` tuple, where ``fixed_boxes`` is a
+        list of ``(page_index, laid_out_fixed_box)`` tuples.
+
+    """
+    context = LayoutContext(enable_hinting, style_for, get_image_from_uri)
+    pages_count = 0
+    fixed_boxes = []
+    for i, page in enumerate(make_all_pages(context, root_box)):
+        fixed_boxes.extend(
+            (i, box) for box in layout_fixed_boxes(context, [page]))
+        pages_count += 1
+    return pages_count, fixed_boxes
+
+
+def uses_pages_count(style_for):
+    """Return whether a margin box displays the ``pages`` counter."""
+    for page_type in PAGE_PSEUDOCLASS_TARGETS[None]:
+        for at_keyword in MARGIN_BOX_AT_KEYWORDS:
+            style = style_for(page_type, at_keyword)
+            if style is None or style.content in ('normal', 'none'):
+                continue
+            for type_, value in style.content:
+                if type_ in ('counter', 'counters') and value[0] == 'pages':
+                    return True
+    return False
+
+
+def has_fixed_boxes(root_box):
+    """Return whether the document has fixed boxes."""
+    return any(
+        box.style.position == 'fixed' for box in root_box.descendants())
+
+
 class LayoutContext(object):
     def __init__(self, enable_hinting, style_for, get_image_from_uri):
         self.enable_hinting = enable_hinting
@@ -75,9 +151,11 @@ class LayoutContext(object):
         self.excluded_shapes = None  # Not initialized yet
         self.string_set = defaultdict(lambda: defaultdict(lambda: list()))
         self.current_page = None
+        # Content widths of boxes, see preferred.cached_content_width()
+        self.content_widths = weakref.WeakKeyDictionary()
 
     def create_block_formatting_context(self):
-        self.excluded_shapes = []
+        self.excluded_shapes = ExcludedShapes()
         self._excluded_shapes_lists.append(self.excluded_shapes)
 
     def finish_block_formatting_context(self, root_box):
@@ -50,6 +50,14 @@ class AbsolutePlaceholder(object):
     def __setattr__(self, name, value):
         setattr(self._box, name, value)
 
+    def __getstate__(self):
+        return self._box, self._layout_done
+
+    def __setstate__(self, state):
+        box, layout_done = state
+        object.__setattr__(self, '_box', box)
+        object.__setattr__(self, '_layout_done', layout_done)
+
     def __repr__(self):
         return '<Placeholder %r>' % self._box
 
@@ -10,6 +10,8 @@
 
 from __future__ import division, unicode_literals
 
+import bisect
+
 from .markers import list_marker_layout
 from .min_max import handle_min_max_width
 from .percentages import resolve_percentages, resolve_position_percentages
@@ -18,6 +20,50 @@ from .tables import table_wrapper_width
 from ..formatting_structure import boxes
 
 
+class ExcludedShapes(list):
+    """The floats of a block formatting context, in layout order.
+
+    The floats are also indexed by the vertical position of their margin box,
+    so that the floats near a given line or block are found without checking
+    all the floats of the formatting context.
+
+    """
+    def __init__(self, shapes=()):
+        super(ExcludedShapes, self).__init__(shapes)
+        self._tops = None
+        self._sorted_shapes = []
+        self._max_height = 0
+
+    def append(self, shape):
+        super(ExcludedShapes, self).append(shape)
+        if self._tops is not None:
+            # Keep the index up to date, it is checked before being used
+            index = bisect.bisect_right(self._tops, shape.position_y)
+            self._tops.insert(index, shape.position_y)
+            self._sorted_shapes.insert(index, shape)
+            self._max_height = max(self._max_height, shape.margin_height())
+
+    def overlapping(self, top, bottom):
+        """Return the shapes that may overlap the ``top`` to ``bottom`` band.
+
+        Shapes touching the band are included too, callers have to check the
+        actual positions of the returned shapes.
+
+        """
+        if self._tops is None or self._tops != [
+                shape.position_y for shape in self._sorted_shapes]:
+            # Floats have been moved with their parents since the index was
+            # built, sort them again
+            self._sorted_shapes = sorted(
+                self, key=lambda shape: shape.position_y)
+            self._tops = [shape.position_y for shape in self._sorted_shapes]
+            self._max_height = max(
+                [shape.margin_height() for shape in self] or [0])
+        start = bisect.bisect_left(self._tops, top - self._max_height)
+        end = bisect.bisect_right(self._tops, bottom)
+        return self._sorted_shapes[start:end]
+
+
 @handle_min_max_width
 def float_width(box, context, containing_block):
     # Check that box.width is auto even if the caller does it too, because
@@ -117,7 +163,8 @@ def get_clearance(context, box, collapsed_margin=0):
     clearance = None
     hypothetical_position = box.position_y + collapsed_margin
     # Hypothetical position is the position of the top border edge
-    for excluded_shape in context.excluded_shapes:
+    for excluded_shape in context.excluded_shapes.overlapping(
+            hypothetical_position, float('inf')):
         if box.style.clear in (excluded_shape.style.float, 'both'):
             y, h = excluded_shape.position_y, excluded_shape.margin_height()
             if hypothetical_position < y + h:
@@ -138,7 +185,8 @@ def avoid_collisions(context, box, containing_block, outer=True):
 
     while True:
         colliding_shapes = [
-            shape for shape in excluded_shapes
+            shape for shape in excluded_shapes.overlapping(
+                position_y, position_y + box_height)
             if (shape.position_y < position_y <
                 shape.position_y + shape.margin_height()) or
             (shape.position_y < position_y + box_height <
@@ -12,8 +12,10 @@
 
 from __future__ import division, unicode_literals
 
+import bisect
+
 from .absolute import absolute_layout, AbsolutePlaceholder
-from .float import avoid_collisions, float_layout
+from .float import ExcludedShapes, avoid_collisions, float_layout
 from .replaced import image_marker_layout
 from .min_max import handle_min_max_width, handle_min_max_height
 from .percentages import resolve_percentages, resolve_one_percentage
@@ -81,7 +83,7 @@ def get_next_linebox(context, linebox, position_y, skip_stack,
         context, linebox, containing_block, outer=False)
     candidate_height = linebox.height
 
-    excluded_shapes = context.excluded_shapes[:]
+    excluded_shapes = ExcludedShapes(context.excluded_shapes)
 
     while 1:
         linebox.position_x = position_x
@@ -675,15 +677,18 @@ def split_text_box(context, box, available_width, line_width, skip):
     assert resume_at != 0
 
     # Convert ``length`` and ``resume_at`` from UTF-8 indexes in text
-    # to Unicode indexes.
-    # No need to encode what’s after resume_at (if set) or length (if
-    # resume_at is not set). One code point is one or more byte, so
-    # UTF-8 indexes are always bigger or equal to Unicode indexes.
+    # to Unicode indexes, with the offsets of the characters in the whole
+    # text of the box: encoding the rest of the text for each line would
+    # take a time quadratic in the number of lines.
     new_text = layout.text_bytes.decode('utf8')
+    offsets = box.utf8_offsets()
+    if offsets is not None:
+        start = offsets[skip]
+        length = bisect.bisect_left(offsets, start + length) - skip
+        if resume_at is not None:
+            resume_at = bisect.bisect_left(offsets, start + resume_at) - skip
     if resume_at is not None:
-        between = text.encode('utf8')[length:resume_at].decode('utf8')
-        resume_at = len(text.encode('utf8')[:resume_at].decode('utf8'))
-    length = len(text.encode('utf8')[:length].decode('utf8'))
+        between = text[length:resume_at]
 
     if length > 0:
         box = box.copy_with_text(new_text)
@@ -20,6 +20,14 @@ from .preferred import min_content_width, max_content_width
 from .min_max import handle_min_max_width, handle_min_max_height
 
 
+MARGIN_BOX_AT_KEYWORDS = (
+    '@top-left-corner', '@top-left', '@top-center', '@top-right',
+    '@top-right-corner', '@bottom-left-corner', '@bottom-left',
+    '@bottom-center', '@bottom-right', '@bottom-right-corner',
+    '@left-top', '@left-middle', '@left-bottom',
+    '@right-top', '@right-middle', '@right-bottom')
+
+
 class OrientedBox(object):
     @property
     def sugar(self):
@@ -536,28 +544,43 @@ def make_page(context, root_box, page_type, resume_at, content_empty,
 
 def make_all_pages(context, root_box):
     """Return a list of laid out pages without margin boxes."""
-    prefix = 'first_'
+    for page, _resume_at, _next_page in make_pages(
+            context, root_box, first_page_side(root_box)):
+        yield page
 
+
+def first_page_side(root_box):
+    """Return whether the first page of the document is a right page."""
     # Special case the root box
     page_break = root_box.style.break_before
     # TODO: take care of text direction and writing mode
     # https://www.w3.org/TR/css3-page/#progression
     if page_break in 'right':
-        right_page = True
+        return True
     elif page_break == 'left':
-        right_page = False
+        return False
     elif page_break in 'recto':
-        right_page = root_box.style.direction == 'ltr'
+        return root_box.style.direction == 'ltr'
     elif page_break == 'verso':
-        right_page = root_box.style.direction == 'rtl'
+        return root_box.style.direction == 'rtl'
     else:
-        right_page = root_box.style.direction == 'ltr'
+        return root_box.style.direction == 'ltr'
+
+
+def make_pages(context, root_box, right_page, resume_at=None, next_page='any',
+               page_number=1, prefix='first_', end_at=None):
+    """Lay out pages without margin boxes, starting at ``resume_at``.
 
-    resume_at = None
-    next_page = 'any'
-    page_number = 0
+    Yield ``(page, resume_at, next_page)`` tuples, until the end of the
+    document or until ``resume_at`` is ``end_at``.
+
+    :param right_page: whether the first page is a right page.
+    :param next_page: as returned by ``make_page()`` for the previous page.
+    :param page_number: the number of the first page.
+    :param prefix: the prefix of the first page type.
+
+    """
     while True:
-        page_number += 1
         content_empty = ((next_page == 'left' and right_page) or
                          (next_page == 'right' and not right_page))
         if content_empty:
@@ -567,8 +590,9 @@ def make_all_pages(context, root_box):
             context, root_box, page_type, resume_at, content_empty,
             page_number)
         assert next_page
-        yield page
-        if resume_at is None:
+        yield page, resume_at, next_page
+        if resume_at is None or resume_at == end_at:
             return
         prefix = ''
         right_page = not right_page
+        page_number += 1
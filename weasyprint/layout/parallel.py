@@ -0,0 +1,228 @@
+# coding: utf-8
+"""
+    weasyprint.layout.parallel
+    --------------------------
+
+    Lay out independent parts of a document in parallel.
+
+    Documents made of chapters or invoices starting with forced page breaks
+    are split into segments at these breaks. The segments are laid out in
+    forked worker processes, and their pages are sent back to the main
+    process where margin boxes, fixed boxes and backgrounds are laid out.
+
+    :copyright: Copyright 2011-2014 Simon Sapin and contributors, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+
+"""
+
+from __future__ import division, unicode_literals
+
+import io
+import os
+import pickle
+import multiprocessing
+
+from .. import images
+from ..css import MISSING
+from ..formatting_structure import boxes
+from .blocks import block_level_page_break
+from .pages import first_page_side, make_all_pages, make_pages
+
+
+# Properties of the page boxes that change the layout of their content.
+PAGE_GEOMETRY_PROPERTIES = (
+    'size', 'width', 'height', 'min_width', 'max_width', 'min_height',
+    'max_height', 'margin_top', 'margin_right', 'margin_bottom',
+    'margin_left', 'padding_top', 'padding_right', 'padding_bottom',
+    'padding_left', 'border_top_width', 'border_right_width',
+    'border_bottom_width', 'border_left_width')
+
+# The layout context and the root box laid out by the worker processes.
+# They are inherited by the forked processes instead of being pickled.
+WORKER_STATE = []
+
+
+class PagesPickler(pickle.Pickler):
+    """Pickler for the pages sent by the worker processes.
+
+    Images and the marker of missing style values are already in the main
+    process, they are not pickled but found again from their ids.
+
+    """
+    def persistent_id(self, obj):
+        if obj is MISSING:
+            return 'missing'
+        elif isinstance(obj, (images.RasterImage, images.SVGImage)):
+            return id(obj)
+
+
+class PagesUnpickler(pickle.Unpickler):
+    """Unpickler for the pages sent by the worker processes."""
+    def __init__(self, file_obj, images_by_id):
+        pickle.Unpickler.__init__(self, file_obj)
+        self.images_by_id = images_by_id
+
+    def persistent_load(self, persistent_id):
+        if persistent_id == 'missing':
+            return MISSING
+        return self.images_by_id[persistent_id]
+
+
+def get_fork_context():
+    """Return the multiprocessing context forking processes, or ``None``."""
+    if not hasattr(os, 'fork'):
+        return None
+    get_context = getattr(multiprocessing, 'get_context', None)
+    if get_context is None:
+        # Python 2 always forks
+        return multiprocessing
+    return get_context('fork')
+
+
+def split_segments(root_box):
+    """Split the document at the forced page breaks between its sections.
+
+    Return a list of ``(resume_at, next_page)`` tuples, where ``resume_at``
+    is where the segment starts, as returned by ``make_page()``, and
+    ``next_page`` is the kind of forced page break before the segment.
+
+    """
+    segments = [(None, 'any')]
+    if not (len(root_box.children) == 1 and
+            isinstance(root_box.children[0], boxes.BlockBox)):
+        return segments
+    body, = root_box.children
+    children = body.children
+    for index in range(1, len(children)):
+        previous_child, child = children[index - 1], children[index]
+        if not (previous_child.is_in_normal_flow() and
+                child.is_in_normal_flow()):
+            continue
+        page_break = block_level_page_break(previous_child, child)
+        if page_break == 'recto':
+            page_break = 'right'
+        elif page_break == 'verso':
+            page_break = 'left'
+        if page_break in ('page', 'left', 'right'):
+            next_page = 'any' if page_break == 'page' else page_break
+            segments.append(((0, (index, None)), next_page))
+    return segments
+
+
+def find_images(box):
+    """Yield the images used by ``box`` and its descendants."""
+    descendants = (
+        box.descendants() if isinstance(box, boxes.ParentBox) else [box])
+    for child in descendants:
+        replacement = getattr(child, 'replacement', None)
+        if replacement is not None:
+            yield replacement
+        marker = getattr(child, 'outside_list_marker', None)
+        if marker is not None:
+            for image in find_images(marker):
+                yield image
+
+
+def layout_segment(task):
+    """Lay out a segment in a worker process.
+
+    Return the pickled ``(pages, string_set, next_page)`` tuple, where
+    ``string_set`` is like ``LayoutContext.string_set`` with page numbers
+    starting at 1 for the first page of the segment.
+
+    """
+    context, root_box = WORKER_STATE
+    resume_at, next_page, end_at, right_page, prefix = task
+    context.string_set.clear()
+    pages = []
+    for page, _, next_page in make_pages(
+            context, root_box, right_page, resume_at, next_page, 1, prefix,
+            end_at):
+        pages.append(page)
+    string_set = dict(
+        (name, dict(values)) for name, values in context.string_set.items())
+    file_obj = io.BytesIO()
+    PagesPickler(file_obj, pickle.HIGHEST_PROTOCOL).dump(
+        (pages, string_set, next_page))
+    return file_obj.getvalue()
+
+
+def make_all_pages_in_parallel(context, root_box, jobs):
+    """Return a list of laid out pages without margin boxes.
+
+    Segments starting with forced page breaks are laid out in ``jobs``
+    worker processes. A segment is laid out again in the main process when
+    it does not start on the side that its worker guessed, unless left and
+    right pages have the same size and margins.
+
+    """
+    segments = split_segments(root_box)
+    fork_context = get_fork_context()
+    if jobs < 2 or len(segments) < 2 or fork_context is None:
+        return list(make_all_pages(context, root_box))
+
+    document_right_page = first_page_side(root_box)
+    tasks = []
+    for i, (resume_at, next_page) in enumerate(segments):
+        end_at = segments[i + 1][0] if i + 1 < len(segments) else None
+        # Guess that no blank page is needed before the segment
+        if next_page == 'any':
+            right_page = document_right_page
+        else:
+            right_page = next_page == 'right'
+        prefix = 'first_' if i == 0 else ''
+        tasks.append((resume_at, next_page, end_at, right_page, prefix))
+
+    WORKER_STATE[:] = [context, root_box]
+    try:
+        pool = fork_context.Pool(jobs)
+        try:
+            results = pool.map(layout_segment, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        del WORKER_STATE[:]
+
+    images_by_id = dict(
+        (id(image), image) for image in find_images(root_box))
+    same_sides = all(
+        getattr(context.style_for('left_page'), name) ==
+        getattr(context.style_for('right_page'), name)
+        for name in PAGE_GEOMETRY_PROPERTIES)
+    all_pages = []
+    right_page = document_right_page
+    next_page = 'any'
+    for task, result in zip(tasks, results):
+        resume_at, guessed_next_page, end_at, guessed_right_page, prefix = task
+        if next_page != guessed_next_page or (
+                right_page != guessed_right_page and
+                (next_page != 'any' or not same_sides)):
+            # The worker guessed wrong, lay out the segment again
+            pages = []
+            for page, _, last_next_page in make_pages(
+                    context, root_box, right_page, resume_at, next_page,
+                    len(all_pages) + 1, prefix, end_at):
+                pages.append(page)
+        else:
+            pages, string_set, last_next_page = PagesUnpickler(
+                io.BytesIO(result), images_by_id).load()
+            if right_page != guessed_right_page:
+                # Only the sides of the pages are wrong: the geometry of
+                # their content is the same, but not their own style
+                for page in pages:
+                    if page.page_type.endswith('right_page'):
+                        page.page_type = page.page_type[:-10] + 'left_page'
+                    else:
+                        page.page_type = page.page_type[:-9] + 'right_page'
+                    style = context.style_for(page.page_type)
+                    style.overflow = page.style.overflow
+                    page.style = style
+            for name, values in string_set.items():
+                for page_number, texts in values.items():
+                    context.string_set[name][
+                        len(all_pages) + page_number].extend(texts)
+        all_pages.extend(pages)
+        right_page = not all_pages[-1].page_type.endswith('right_page')
+        next_page = last_next_page
+    return all_pages
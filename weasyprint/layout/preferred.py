@@ -16,6 +16,7 @@
 
 from __future__ import division, unicode_literals
 
+import functools
 import sys
 import weakref
 
@@ -40,6 +41,31 @@ def shrink_to_fit(context, box, available_width):
         max_content_width(context, box, outer=False))
 
 
+def cached_content_width(function):
+    """Decorate a function computing the content widths of boxes.
+
+    The content widths of a box are needed many times, by its ancestors and
+    by its own layout, and computing them requires to walk through all its
+    descendants. They are cached in ``context.content_widths`` for each box,
+    during one layout of the document and until the children of the box are
+    replaced.
+
+    """
+    @functools.wraps(function)
+    def wrapper(context, box, outer=True):
+        children = getattr(box, 'children', None)
+        cached = context.content_widths.get(box)
+        if cached is None or cached[0] is not children:
+            cached = context.content_widths[box] = (children, {})
+        widths = cached[1]
+        key = (function, outer)
+        if key not in widths:
+            widths[key] = function(context, box, outer)
+        return widths[key]
+    return wrapper
+
+
+@cached_content_width
 def min_content_width(context, box, outer=True):
     """Return the min-content width for ``box``.
 
@@ -64,6 +90,7 @@ def min_content_width(context, box, outer=True):
             type(box).__name__)
 
 
+@cached_content_width
 def max_content_width(context, box, outer=True):
     """Return the max-content width for ``box``.
 
@@ -279,6 +306,62 @@ def _percentage_contribution(box):
     return max(min_width, min(width, max_width))
 
 
+def _text_lengths(box):
+    """Return the lengths of the text and of the longest word in ``box``.
+
+    Return ``None`` if ``box`` includes replaced boxes, whose size can't be
+    guessed from their text.
+
+    """
+    total = longest = 0
+    for child in box.descendants():
+        if isinstance(child, boxes.TextBox):
+            total += len(child.text)
+            longest = max(
+                [longest] + [len(word) for word in child.text.split()])
+        elif isinstance(child, boxes.ReplacedBox):
+            return None
+    return total, longest
+
+
+def _sampled_grid(table, grid):
+    """Return the rows of ``grid`` used to get the widths of the columns.
+
+    With ``-weasy-table-sample-rows: N``, the content widths are only
+    measured for the first N rows of the body, the rows of headers and
+    footers, and the rows whose cells have more text than the cells of the
+    previous rows in the same column. Cell texts are counted, not laid out.
+
+    """
+    sample_rows = table.style.table_sample_rows
+    grid_width = len(grid[0]) if grid else 0
+    max_lengths = [(0, 0)] * grid_width
+    sampled_grid = []
+    body_rows = 0
+    row_number = 0
+    for row_group in table.children:
+        for row in row_group.children:
+            grid_row = grid[row_number]
+            row_number += 1
+            lengths = [
+                _text_lengths(cell) if cell else (0, 0) for cell in grid_row]
+            repeated = row_group.is_header or row_group.is_footer
+            if not repeated:
+                body_rows += 1
+            if not (repeated or body_rows <= sample_rows or any(
+                    length is None or
+                    length[0] > max_length[0] or length[1] > max_length[1]
+                    for length, max_length in zip(lengths, max_lengths))):
+                continue
+            sampled_grid.append(grid_row)
+            max_lengths = [
+                max_length if length is None else (
+                    max(length[0], max_length[0]),
+                    max(length[1], max_length[1]))
+                for length, max_length in zip(lengths, max_lengths)]
+    return sampled_grid
+
+
 def table_and_columns_preferred_widths(context, box, outer=True):
     """Return content widths for the auto layout table and its columns.
 
@@ -323,6 +406,10 @@ def table_and_columns_preferred_widths(context, box, outer=True):
     else:
         total_horizontal_border_spacing = 0
 
+    if table.style.table_sample_rows != 'none':
+        grid = _sampled_grid(table, grid)
+        zipped_grid = list(zip(*grid))
+
     if grid_width == 0 or grid_height == 0:
         table.children = []
         min_width = block_min_content_width(context, table, outer=False)
@@ -383,67 +470,70 @@ def table_and_columns_preferred_widths(context, box, outer=True):
                     _percentage_contribution(cell))
 
     # Intermediate content widths for span N
-    for span in range(1, grid_width):
-        min_contributions = []
-        max_contributions = []
-        percentage_contributions = []
-        for i in range(grid_width):
-            min_contribution = min_content_widths[i]
-            max_contribution = max_content_widths[i]
-            percentage_contribution = intrinsic_percentages[i]
-            for j, cell in enumerate(zipped_grid[i]):
-                indexes = [k for k in range(i + 1) if grid[j][k]]
-                if not indexes:
-                    continue
-                origin = max(indexes)
-                origin_cell = grid[j][origin]
-                if origin_cell.colspan - 1 != span:
-                    continue
-                cell_slice = slice(origin, origin + origin_cell.colspan)
-                baseline_border_spacing = (
-                    (origin_cell.colspan - 1) *
-                    table.style.border_spacing[0])
-                baseline_min_content = sum(min_content_widths[cell_slice])
-                baseline_max_content = sum(max_content_widths[cell_slice])
-                baseline_percentage = sum(
-                    intrinsic_percentages[cell_slice])
-
+    # Each cell contributes to the columns from its origin to the next cell of
+    # its row, store the cells spanning many columns once instead of looking
+    # for the origin of each grid slot for each span.
+    spanning_cells = {}
+    for row in grid:
+        origins = [k for k, cell in enumerate(row) if cell]
+        for origin, end in zip(origins, origins[1:] + [grid_width]):
+            origin_cell = row[origin]
+            if origin_cell.colspan > 1:
+                spanning_cells.setdefault(origin_cell.colspan - 1, []).append(
+                    (origin, end, origin_cell))
+
+    # Spans without cells keep the same contributions
+    for span in sorted(spanning_cells):
+        min_contributions = min_content_widths[:]
+        max_contributions = max_content_widths[:]
+        percentage_contributions = intrinsic_percentages[:]
+        for origin, end, origin_cell in spanning_cells[span]:
+            cell_slice = slice(origin, origin + origin_cell.colspan)
+            baseline_border_spacing = (
+                (origin_cell.colspan - 1) *
+                table.style.border_spacing[0])
+            baseline_min_content = sum(min_content_widths[cell_slice])
+            baseline_max_content = sum(max_content_widths[cell_slice])
+            baseline_percentage = sum(
+                intrinsic_percentages[cell_slice])
+            baseline_diff = baseline_max_content - baseline_min_content
+
+            cell_min_width = max(
+                0,
+                min_content_width(context, origin_cell) -
+                baseline_max_content - baseline_border_spacing)
+
+            cell_max_width = max(
+                0,
+                max_content_width(context, origin_cell) -
+                baseline_max_content - baseline_border_spacing)
+
+            clamped_cell_width = min(
+                cell_min_width,
+                baseline_max_content - baseline_min_content)
+
+            for i in range(origin, end):
                 # Cell contributiion to min- and max-content widths
                 content_width_diff = (
                     max_content_widths[i] - min_content_widths[i])
-                baseline_diff = baseline_max_content - baseline_min_content
                 if baseline_diff:
                     diff_ratio = content_width_diff / baseline_diff
                 else:
                     diff_ratio = 0
 
-                cell_min_width = max(
-                    0,
-                    min_content_width(context, grid[j][origin]) -
-                    baseline_max_content - baseline_border_spacing)
-
-                cell_max_width = max(
-                    0,
-                    max_content_width(context, grid[j][origin]) -
-                    baseline_max_content - baseline_border_spacing)
-
-                clamped_cell_width = min(
-                    cell_min_width,
-                    baseline_max_content - baseline_min_content)
-
                 if baseline_max_content:
                     ratio = max_content_widths[i] / baseline_max_content
                 else:
                     ratio = 0
 
-                min_contribution = max(
-                    min_contribution,
+                min_contributions[i] = max(
+                    min_contributions[i],
                     min_content_widths[i] +
                     diff_ratio * clamped_cell_width +
                     (1 - ratio) * cell_min_width)
 
-                max_contribution = max(
-                    max_contribution,
+                max_contributions[i] = max(
+                    max_contributions[i],
                     max_content_widths[i] + (1 - ratio) * cell_max_width)
 
                 # Cell contributiion to intrinsic percentage width
@@ -465,11 +555,7 @@ def table_and_columns_preferred_widths(context, box, outer=True):
                         ratio = (
                             max_content_widths[i] /
                             other_columns_contributions_sum)
-                    percentage_contribution = diff * ratio
-
-            min_contributions.append(min_contribution)
-            max_contributions.append(max_contribution)
-            percentage_contributions.append(percentage_contribution)
+                    percentage_contributions[i] = diff * ratio
 
         min_content_widths = min_contributions
         max_content_widths = max_contributions
@@ -12,6 +12,9 @@
 
 from __future__ import division, unicode_literals
 
+import collections
+import weakref
+
 from ..compat import xrange
 from ..logger import LOGGER
 from ..formatting_structure import boxes
@@ -19,6 +22,12 @@ from ..css.properties import Dimension
 from .percentages import resolve_percentages, resolve_one_percentage
 from .preferred import table_and_columns_preferred_widths, max_content_width
 
+# Max-content widths of the cells of tables, see auto_table_layout().
+CELLS_WIDTHS_CACHE = weakref.WeakKeyDictionary()
+
+# Laid out header and footer groups of tables, see table_layout().
+REPEATED_GROUPS_CACHE = weakref.WeakKeyDictionary()
+
 
 def table_layout(context, table, max_position_y, skip_stack,
                  containing_block, device_size, page_is_empty, absolute_boxes,
@@ -72,8 +81,10 @@ def table_layout(context, table, max_position_y, skip_stack,
         group.position_y = position_y
         group.width = rows_width
         new_group_children = []
-        # For each rows, cells for which this is the last row (with rowspan)
-        ending_cells_by_row = [[] for row in group.children]
+        # For each rows, cells for which this is the last row (with rowspan).
+        # Lists are only added for the next rows spanned by cells, as long row
+        # groups are laid out on many pages.
+        ending_cells_by_row = collections.deque()
 
         is_group_start = skip_stack is None
         if is_group_start:
@@ -161,8 +172,11 @@ def table_layout(context, table, max_position_y, skip_stack,
 
             # row height
             for cell in row.children:
+                while len(ending_cells_by_row) < cell.rowspan:
+                    ending_cells_by_row.append([])
                 ending_cells_by_row[cell.rowspan - 1].append(cell)
-            ending_cells = ending_cells_by_row.pop(0)
+            ending_cells = (
+                ending_cells_by_row.popleft() if ending_cells_by_row else [])
             if ending_cells:  # in this row
                 if row.height == 'auto':
                     row_bottom_y = max(
@@ -273,28 +287,49 @@ def table_layout(context, table, max_position_y, skip_stack,
     position_y = table.content_box_y() + border_spacing_y
     initial_position_y = position_y
 
+    def repeated_group_layout(group):
+        """Lay out a header or footer group, repeated on each page.
+
+        Return ``None`` if the group is too big for the page. The group is
+        laid out once, translated copies are used on the next pages.
+
+        """
+        key = (tuple(column_widths), rows_x, rows_width, table.width)
+        cached = REPEATED_GROUPS_CACHE.get(group)
+        if cached is not None and cached[0] == key:
+            new_group = cached[1]
+            if new_group.children and (
+                    position_y + new_group.height + border_spacing_y >
+                    max_position_y):
+                return None
+            new_group = new_group.deepcopy()
+            new_group.translate(dy=position_y - new_group.position_y)
+            return new_group
+
+        positioned_boxes = len(absolute_boxes) + len(fixed_boxes)
+        new_group, resume_at = group_layout(
+            group, position_y, max_position_y,
+            skip_stack=None, page_is_empty=False)
+        if new_group is None or resume_at:
+            return None
+        if len(absolute_boxes) + len(fixed_boxes) == positioned_boxes:
+            # Groups with positioned boxes are laid out again on each page,
+            # as these boxes are laid out with the page
+            REPEATED_GROUPS_CACHE[group] = (key, new_group.deepcopy())
+        return new_group
+
     def all_groups_layout():
         if table.children and table.children[0].is_header:
-            header = table.children[0]
-            header, resume_at = group_layout(
-                header, position_y, max_position_y,
-                skip_stack=None, page_is_empty=False)
-            if header and not resume_at:
+            header = repeated_group_layout(table.children[0])
+            if header is not None:
                 header_height = header.height + border_spacing_y
-            else:  # Header too big for the page
-                header = None
         else:
             header = None
 
         if table.children and table.children[-1].is_footer:
-            footer = table.children[-1]
-            footer, resume_at = group_layout(
-                footer, position_y, max_position_y,
-                skip_stack=None, page_is_empty=False)
-            if footer and not resume_at:
+            footer = repeated_group_layout(table.children[-1])
+            if footer is not None:
                 footer_height = footer.height + border_spacing_y
-            else:  # Footer too big for the page
-                footer = None
         else:
             footer = None
 
@@ -596,17 +631,24 @@ def auto_table_layout(context, box, containing_block):
         table.column_widths = max_content_guess
         excess_width = assignable_width - sum(max_content_guess)
 
+        # Max-content widths of the cells in each column, computed once for
+        # the groups below and for the next pages of the table
+        cached = CELLS_WIDTHS_CACHE.get(table)
+        if cached is None or cached[0] is not grid:
+            cached = CELLS_WIDTHS_CACHE[table] = (grid, [
+                [max_content_width(context, cell) for cell in column if cell]
+                for column in grid])
+        cells_max_content_widths = cached[1]
+
         # First group
         columns = [
             (i, column) for i, column in enumerate(grid)
             if not constrainedness[i] and
             column_intrinsic_percentages[i] == 0 and
-            any(max_content_width(context, cell) for cell in column if cell)]
+            any(cells_max_content_widths[i])]
         if columns:
             widths = [
-                max(max_content_width(context, cell)
-                    for cell in column if cell)
-                for i, column in columns]
+                max(cells_max_content_widths[i]) for i, column in columns]
             current_widths = [
                 table.column_widths[i] for i, column in columns]
             differences = [
@@ -637,12 +679,10 @@ def auto_table_layout(context, box, containing_block):
             (i, column) for i, column in enumerate(grid)
             if constrainedness[i] and
             column_intrinsic_percentages[i] == 0 and
-            any(max_content_width(context, cell) for cell in column if cell)]
+            any(cells_max_content_widths[i])]
         if columns:
             widths = [
-                max(max_content_width(context, cell)
-                    for cell in column if cell)
-                for i, column in columns]
+                max(cells_max_content_widths[i]) for i, column in columns]
             current_widths = [
                 table.column_widths[i] for i, column in columns]
             differences = [
@@ -708,9 +748,7 @@ def auto_table_layout(context, box, containing_block):
             i for i, column in enumerate(grid)
             if any(column) and
             column_intrinsic_percentages[i] == 0 and
-            not any(
-                max_content_width(context, cell)
-                for cell in column if cell)]
+            not any(cells_max_content_widths[i])]
         if columns:
             for i in columns:
                 table.column_widths[i] += excess_width / len(columns)
@@ -739,6 +777,8 @@ def table_wrapper_width(context, wrapper, containing_block):
 
     wrapper.width = table.border_width()
     wrapper.style.width = Dimension(wrapper.width, 'px')
+    # The content widths of the wrapper depend on its width
+    context.content_widths.pop(wrapper, None)
 
 
 def cell_baseline(cell):
@@ -0,0 +1,82 @@
+# coding: utf-8
+"""
+    weasyprint.lru
+    --------------
+
+    Bounded caches keeping the most recently used items.
+
+    :copyright: Copyright 2011-2014 Simon Sapin and contributors, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+
+"""
+
+from __future__ import division, unicode_literals
+
+import collections
+import threading
+
+
+class LRUCache(object):
+    """A mapping keeping at most ``max_size`` recently used items.
+
+    When ``get_bytes`` is given, it returns the size in bytes of the values,
+    and the items also use at most ``max_bytes`` bytes. Values larger than
+    ``max_bytes`` are not stored. :obj:`None` means no limit. New limits are
+    applied when the next item is stored.
+
+    The ``hits`` and ``misses`` attributes count the results of :meth:`get`,
+    the ``bytes`` attribute is the size of the stored items.
+
+    """
+    def __init__(self, max_size=None, max_bytes=None, get_bytes=None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.get_bytes = get_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._items = collections.OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value for ``key`` and mark it as recently used."""
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self.bytes -= self._sizes.pop(key, 0)
+            if self.get_bytes is not None:
+                size = self.get_bytes(value)
+                if self.max_bytes is not None and size > self.max_bytes:
+                    return
+                self._sizes[key] = size
+                self.bytes += size
+            self._items[key] = value
+            while ((self.max_size is not None and
+                    len(self._items) > self.max_size) or
+                   (self.max_bytes is not None and
+                    self.bytes > self.max_bytes)):
+                old_key, _ = self._items.popitem(last=False)
+                self.bytes -= self._sizes.pop(old_key, 0)
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        """Remove all items and reset the counters."""
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.hits = 0
+            self.misses = 0
+            self.bytes = 0
@@ -17,7 +17,7 @@ import os.path
 
 from weasyprint import HTML, CSS
 from weasyprint.urls import url_is_absolute
-from weasyprint.compat import parse_qs, base64_encode, iteritems
+from weasyprint.compat import parse_qs, base64_encode, iteritems, izip
 
 
 FAVICON = os.path.join(os.path.dirname(__file__),
@@ -30,8 +30,8 @@ STYLESHEET = CSS(string='''
 
 def get_pages(html):
     document = html.render(enable_hinting=True, stylesheets=[STYLESHEET])
-    for page in document.pages:
-        png_bytes, width, height = document.copy([page]).write_png()
+    for page, (png_bytes, width, height) in izip(
+            document.pages, document.write_pngs()):
         data_url = 'data:image/png;base64,' + (
             base64_encode(png_bytes).decode('ascii').replace('\n', ''))
         yield width, height, data_url, page.links, page.anchors
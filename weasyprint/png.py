@@ -0,0 +1,155 @@
+# coding: utf-8
+"""
+    weasyprint.png
+    --------------
+
+    Write PNG images page by page, without keeping the whole image in memory.
+
+    Each page is painted on its own cairo image surface, that cairo writes
+    as a small PNG image. The rows of this image are decompressed one by one
+    and compressed again in the final image.
+
+    cairo writes images without transparency as RGB instead of RGBA. The
+    surfaces of the pages have an extra transparent column on their right,
+    so that all the pages are written as RGBA. This column is then removed
+    from each row, which does not change the other pixels as PNG filters
+    only depend on the pixels on the left and above.
+
+    :copyright: Copyright 2011-2014 Simon Sapin and contributors, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+
+"""
+
+from __future__ import division, unicode_literals
+
+import io
+import struct
+import zlib
+
+import cairocffi as cairo
+
+from .compat import xrange
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Bytes per pixel of 8-bit RGBA images
+BYTES_PER_PIXEL = 4
+
+# Size of the compressed data written in each IDAT chunk
+IDAT_SIZE = 2 ** 16
+
+
+def write_chunk(file_obj, chunk_type, data):
+    """Write a PNG chunk with its length and its checksum."""
+    file_obj.write(struct.pack('>I', len(data)))
+    file_obj.write(chunk_type)
+    file_obj.write(data)
+    file_obj.write(struct.pack(
+        '>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def read_chunks(png_bytes):
+    """Yield the ``(chunk_type, data)`` tuples of a PNG image."""
+    assert png_bytes[:8] == PNG_SIGNATURE
+    position = 8
+    while position < len(png_bytes):
+        length, = struct.unpack('>I', png_bytes[position:position + 4])
+        chunk_type = png_bytes[position + 4:position + 8]
+        yield chunk_type, png_bytes[position + 8:position + 8 + length]
+        position += length + 12
+
+
+def unfilter_first_row(row):
+    """Filter ``row`` so that it does not depend on the previous row.
+
+    The first row of an image is filtered as if the previous row was made of
+    zeros. Sub and None filters do not use the previous row, Up is then the
+    same as None and Paeth the same as Sub, Average has to be removed.
+
+    """
+    row = bytearray(row)
+    filter_type = row[0]
+    if filter_type == 2:
+        row[0] = 0
+    elif filter_type == 4:
+        row[0] = 1
+    elif filter_type == 3:
+        for i in xrange(1 + BYTES_PER_PIXEL, len(row)):
+            row[i] = (row[i] + row[i - BYTES_PER_PIXEL] // 2) & 0xff
+        row[0] = 0
+    return bytes(row)
+
+
+def surface_rows(surface, width):
+    """Yield the filtered rows of ``surface``, cut at ``width`` pixels.
+
+    ``surface`` is an ARGB32 image surface whose last column is transparent.
+
+    """
+    file_obj = io.BytesIO()
+    surface.write_to_png(file_obj)
+    png_bytes = file_obj.getvalue()
+    del file_obj
+    chunks = list(read_chunks(png_bytes))
+    header = chunks[0][1]
+    surface_width, height, depth, color_type, _, _, interlace = (
+        struct.unpack('>IIBBBBB', header))
+    assert (depth, color_type, interlace) == (8, 6, 0)
+    compressed = b''.join(
+        data for chunk_type, data in chunks if chunk_type == b'IDAT')
+    del png_bytes, chunks
+
+    row_length = 1 + surface_width * BYTES_PER_PIXEL
+    decompressor = zlib.decompressobj()
+    for i in xrange(height):
+        row = b''
+        while len(row) < row_length:
+            data = decompressor.decompress(compressed, row_length - len(row))
+            assert data, 'Truncated PNG image'
+            compressed = decompressor.unconsumed_tail
+            row += data
+        row = row[:1 + width * BYTES_PER_PIXEL]
+        yield unfilter_first_row(row) if i == 0 else row
+
+
+def write_png(file_obj, width, height, surfaces):
+    """Write a PNG image made of ``surfaces`` one below the other.
+
+    :param width: The width of the image, in pixels.
+    :param height: The height of the image, in pixels.
+    :param surfaces:
+        An iterable of ARGB32 image surfaces, as wide as the image plus a
+        transparent column on their right. Their heights add up to the
+        height of the image. Only one surface is kept at a time.
+
+    """
+    file_obj.write(PNG_SIGNATURE)
+    write_chunk(file_obj, b'IHDR', struct.pack(
+        '>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+    compressor = zlib.compressobj()
+    pending = []
+    pending_size = 0
+    for surface in surfaces:
+        for row in surface_rows(surface, width):
+            data = compressor.compress(row)
+            if data:
+                pending.append(data)
+                pending_size += len(data)
+                if pending_size >= IDAT_SIZE:
+                    write_chunk(file_obj, b'IDAT', b''.join(pending))
+                    pending = []
+                    pending_size = 0
+        surface.finish()
+    pending.append(compressor.flush())
+    write_chunk(file_obj, b'IDAT', b''.join(pending))
+    write_chunk(file_obj, b'IEND', b'')
+
+
+def page_surface(width, height):
+    """Return a surface for a page of the final image.
+
+    The surface is ``width`` pixels wide plus a transparent column.
+
+    """
+    return cairo.ImageSurface(cairo.FORMAT_ARGB32, width + 1, height)
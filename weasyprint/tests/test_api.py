@@ -18,6 +18,7 @@ import sys
 import math
 import contextlib
 import threading
+import subprocess
 import gzip
 import zlib
 
@@ -34,8 +35,9 @@ from ..compat import urljoin, urlencode, urlparse_uses_relative, iteritems
 from ..urls import path2url
 from .. import HTML, CSS, default_url_fetcher
 from .. import __main__
-from .. import navigator
+from .. import navigator, pdf
 from ..document import _TaggedTuple
+from ..draw import draw_page
 
 
 CHDIR_LOCK = threading.Lock()
@@ -450,6 +452,47 @@ def test_unicode_filenames():
                 assert read_file(unicode_filename) == png_bytes
 
 
+@assert_no_logs
+def test_streaming_pdf():
+    for html in [
+        '<p>a</p><p>b</p>',
+        '<style>@page { @top-center { content: counter(pages) } }</style>'
+        '<p>a</p><p>b</p>',
+        '<div style="position: fixed">f</div><p>a</p><p>b</p>',
+        '<a href="#b">a</a><p id="b">b</p>',
+        # Layout twice with the same boxes, with table wrappers whose style
+        # is changed by the layout
+        '<style>@page { @top-center { content: counter(pages) } }</style>'
+        '<div style="float: left"><table><tr><td>a b</td></tr></table></div>'
+        '<p>b</p>',
+    ]:
+        html = FakeHTML(string=html)
+        css = CSS(string='p { page-break-before: always }')
+        pdf_bytes = html.write_pdf(stylesheets=[css])
+        assert html.write_pdf(stylesheets=[css], streaming=True) == pdf_bytes
+
+
+@assert_no_logs
+def test_parallel_layout():
+    for html, css in [
+        ('<p>a</p><p>b</p><p>c</p>', 'p { page-break-before: always }'),
+        ('<h1>a</h1><p>b</p><h1>c</h1><p>d</p><p>e</p><h1>f</h1>',
+         'h1 { page-break-before: right; string-set: title content() } '
+         '@page { @top-center { content: string(title) counter(page) } } '
+         '@page :left { margin-left: 50px }'),
+        ('<img src=pattern.png><div>a</div><img src=pattern.png>',
+         'img { display: block; page-break-before: page }'),
+        ('<h1>a</h1><p>b</p><p>c</p><h1>d</h1><p>e</p><h1>f</h1>',
+         'h1, p { page-break-before: always } '
+         '@page :left { background: yellow }'),
+    ]:
+        with chdir(resource_filename('')):
+            html = FakeHTML(string=html, base_url='dummy.html')
+            css = CSS(string=css)
+            pdf_bytes = html.write_pdf(stylesheets=[css])
+            assert html.write_pdf(stylesheets=[css], jobs=2) == pdf_bytes
+
+
 @assert_no_logs
 def test_low_level_api():
     html = FakeHTML(string='<body>')
@@ -526,6 +569,122 @@ def test_low_level_api():
     assert png_size(document.copy([page_2]).write_png()) == (6, 4)
 
 
+@assert_no_logs
+def test_recorded_pages():
+    html = FakeHTML(string='<body>')
+    css = CSS(string='''
+        @page { margin: 2px; size: 8px; background: #fff }
+        html { background: #00f; }
+        body { background: #f00; width: 1px; height: 1px }
+    ''')
+    expected_page, = html.render([css]).pages
+    document = html.render([css])
+    page, = document.pages
+    page.record()
+    assert page._page_box is None
+
+    # Recorded pages are embedded as form XObjects in PDF, compare what the
+    # pages show instead of the bytes
+    pdf_bytes = document.write_pdf()
+    sizes = [pdf_page.get_value('MediaBox', '\\[(.+?)\\]').strip()
+             for pdf_page in pdf.PDFFile(io.BytesIO(pdf_bytes)).pages]
+    assert sizes == [b'0 0 6 6']
+    pixels = []
+    for painted_page in (expected_page, page):
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 8, 8)
+        painted_page.paint(cairo.Context(surface))
+        pixels.append(image_to_pixels(surface, 8, 8))
+    assert pixels[0] == pixels[1]
+
+    png_bytes, width, height = document.write_png()
+    check_png_pattern(png_bytes)
+    png_bytes, width, height = document.write_png(resolution=192)
+    assert (width, height) == (16, 16)
+    check_png_pattern(png_bytes, x2=True)
+
+
+@assert_no_logs
+def test_png_resolution_hinting():
+    """Test that pages are drawn at the resolution of PNG images."""
+    document = FakeHTML(string='''
+        <style>
+            @page { size: 40px 20px; margin: 0; background: #fff }
+            p { border: 1.5px solid red; margin: 0.7px; font-size: 7.3px }
+        </style>
+        <p>Lorem ipsum''').render(enable_hinting=True)
+    page, = document.pages
+    png_bytes, width, height = document.write_png(resolution=192)
+    assert (width, height) == (80, 40)
+
+    # Draw the page box directly on a surface scaled like the PNG image
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    context = cairo.Context(surface)
+    context.scale(2, 2)
+    draw_page(page._page_box, context, enable_hinting=True)
+    expected_pixels = image_to_pixels(surface, width, height)
+    surface = cairo.ImageSurface.create_from_png(io.BytesIO(png_bytes))
+    assert image_to_pixels(surface, width, height) == expected_pixels
+
+
+@assert_no_logs
+def test_streaming_png():
+    html = FakeHTML(string='<body>')
+    css = CSS(string='''
+        @page { margin: 2px; size: 8px; background: #fff }
+        html { background: #00f; }
+        body { background: #f00; width: 1px; height: 1px }
+    ''')
+    document = html.render([css], enable_hinting=True)
+    png_bytes, width, height = document.write_png(streaming=True)
+    assert (width, height) == (8, 8)
+    check_png_pattern(png_bytes)
+    png_bytes = html.write_png(
+        stylesheets=[css], resolution=192, streaming=True)
+    check_png_pattern(png_bytes, x2=True)
+
+    document = FakeHTML(string='''
+        <style>
+            @page:first { size: 5px 10px; background: #f00 }
+            @page { size: 6px 4px; background: rgba(0, 0, 255, 0.5) }
+            p { page-break-before: always }
+        </style>
+        <p></p>
+        <p></p>
+    ''').render(enable_hinting=True)
+    pixels = []
+    for streaming in (False, True):
+        png_bytes, width, height = document.write_png(streaming=streaming)
+        assert (width, height) == (6, 14)
+        surface = cairo.ImageSurface.create_from_png(io.BytesIO(png_bytes))
+        pixels.append(image_to_pixels(surface, width, height))
+    assert pixels[0] == pixels[1]
+
+    with temp_directory() as temp:
+        filename = os.path.join(temp, 'out.png')
+        document.write_png(filename, streaming=True)
+        assert read_file(filename) == document.write_png(streaming=True)[0]
+
+
+@assert_no_logs
+def test_write_pngs():
+    document = FakeHTML(string='''
+        <style>
+            @page:first { size: 5px 10px } @page { size: 6px 4px }
+            p { page-break-before: always }
+        </style>
+        <p></p>
+        <p></p>
+        <p></p>
+    ''').render()
+    expected = [
+        document.copy([page]).write_png(resolution=192)
+        for page in document.pages]
+    assert [size for _, size, _ in expected] == [10, 12, 12]
+    assert list(document.write_pngs(resolution=192)) == expected
+    assert list(document.write_pngs(resolution=192, jobs=2)) == expected
+    assert list(document.copy([]).write_pngs(jobs=2)) == []
+
+
 def round_meta(pages):
     """Eliminate errors of floating point arithmetic for metadata.
     (eg. 49.99999999999994 instead of 50)
@@ -1016,3 +1175,21 @@ def test_http():
         assert HTML(root_url + '/gzip').root_element.get('test') == 'ok'
         assert HTML(root_url + '/deflate').root_element.get('test') == 'ok'
         assert HTML(root_url + '/raw-deflate').root_element.get('test') == 'ok'
+
+
+@assert_no_logs
+def test_import_time():
+    """Test that importing WeasyPrint defers slow work to the first use."""
+    code = '\n'.join([
+        'import sys',
+        'import weasyprint.html, weasyprint.text',
+        'print(sorted(set(sys.modules) & set([',
+        '    "html5lib", "cairosvg", "pyphen", "pycparser"])))',
+        'print(weasyprint.html.UA_STYLESHEETS == {})',
+        'print(weasyprint.text.pango is None)',
+    ])
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    output = subprocess.check_output(
+        [sys.executable, '-c', code], cwd=root).decode('ascii').split()
+    assert output == ['[]', 'True', 'True']
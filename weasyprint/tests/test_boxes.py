@@ -12,6 +12,7 @@
 
 from __future__ import division, unicode_literals
 
+import base64
 import functools
 import pprint
 import difflib
@@ -356,6 +357,74 @@ def test_styles():
             assert child.style.margin_top == (42, 'px')
 
 
+@assert_no_logs
+def test_shared_styles():
+    """Test boxes of elements sharing their computed style."""
+    box = parse_all('''
+        <style>
+            p { counter-increment: p; -weasy-bookmark-label: counter(p);
+                -weasy-string-set: title counter(p) }
+            td { border: 1px solid }
+        </style>
+        <p></p><p></p>
+        <table style="border-collapse: collapse"><tr><td></td><td></td>
+        </table>''')
+    p_1, p_2, wrapper = unwrap_html_body(box)
+    assert p_1.style.bookmark_label == '1'
+    assert p_2.style.bookmark_label == '2'
+    assert p_1.style.string_set == [('title', '1')]
+    assert p_2.style.string_set == [('title', '2')]
+
+    table, = wrapper.children
+    row_group, = table.children
+    row, = row_group.children
+    td_1, td_2 = row.children
+    # Collapsed borders are set on each cell
+    assert td_1.style.border_left_width == 0.5
+    assert td_1.style.border_right_width == 0.5
+    assert td_2.style.border_left_width == 0.5
+    assert td_2.style.border_right_width == 0.5
+    assert td_1.style.border_left_color == (0, 0, 0, 0)
+
+
+@assert_no_logs
+def test_box_copy():
+    """Test the copies of boxes with attributes in slots."""
+    box = parse('<p>Lorem ipsum</p>')
+    paragraph, = unwrap_html_body(box)
+    assert not hasattr(paragraph, '__dict__')
+    assert paragraph.position_y is None
+    assert not paragraph.is_for_root_element
+    copy = paragraph.copy()
+    assert copy.element_tag == 'p'
+    assert copy.children == paragraph.children
+    assert copy.style is not paragraph.style
+    assert copy.position_y is None
+
+    paragraph.position_y = 12
+    paragraph.is_for_root_element = True
+    copy = paragraph.copy_with_children([])
+    assert copy.position_y == 12
+    assert copy.is_for_root_element
+    assert copy.children == ()
+    assert paragraph.children != []
+
+
+@assert_no_logs
+def test_utf8_offsets():
+    """Test the UTF-8 offsets of the characters of text boxes."""
+    box = parse_all('<p>abc</p><p>aé€😀b</p>')
+    p_1, p_2 = unwrap_html_body(box)
+    ascii_text, = p_1.children[0].children
+    assert ascii_text.utf8_offsets() is None
+    text, = p_2.children[0].children
+    offsets = text.utf8_offsets()
+    assert offsets == [0, 1, 3, 6, 10, 11]
+    assert len(text.text.encode('utf8')) == offsets[-1]
+    assert text.utf8_offsets() is offsets
+    assert text.copy_with_text('é').utf8_offsets() == [0, 2]
+
+
 @assert_no_logs
 def test_whitespace():
     """Test the management of white spaces."""
@@ -455,6 +524,85 @@ def test_images():
                     ('img', 'Text', 'No base_url')])])])])
 
 
+@assert_no_logs
+def test_image_cache():
+    """Test the images shared by different documents."""
+    def get_images():
+        html = parse('<p><img src=pattern.png><img src=pattern.png>')
+        paragraph, = unwrap_html_body(html)
+        return [box.replacement for box in paragraph.children]
+
+    cache = images.IMAGE_CACHE
+    max_bytes = cache.max_bytes
+    cache.clear()
+    try:
+        cache.max_bytes = 0
+        image_1, image_2 = get_images()
+        assert image_1 is image_2
+        image_3, _ = get_images()
+        assert image_3 is not image_1
+        assert len(cache) == 0
+
+        cache.max_bytes = 1000
+        image_1, _ = get_images()
+        image_2, _ = get_images()
+        assert image_1 is image_2
+        assert len(cache) == 1
+        # 4×4 pixels, 4 bytes per pixel
+        assert cache.bytes == 64
+
+        cache.max_bytes = 100
+        cache['other'] = image_1
+        assert len(cache) == 1
+        assert cache.bytes == 64
+        image_4, _ = get_images()
+        assert image_4 is not image_1
+        assert get_images()[0] is image_4
+        assert cache.get('other') is None
+    finally:
+        cache.clear()
+        cache.max_bytes = max_bytes
+
+
+@assert_no_logs
+def test_lazy_images():
+    """Test raster images only decoded when they are drawn."""
+    for filename in ['pattern.png', 'pattern.gif', 'blue.jpg']:
+        paragraph, = unwrap_html_body(parse('<p><img src=%s>' % filename))
+        img, = paragraph.children
+        image = img.replacement
+        assert image._decode is not None
+        assert image.get_intrinsic_size(1, 16) == (4, 4)
+        assert image.intrinsic_ratio == 1
+        assert image._decode is not None
+        surface = image.image_surface
+        assert (surface.get_width(), surface.get_height()) == (4, 4)
+        assert image._decode is None
+
+    with open(resource_filename('pattern.png'), 'rb') as fd:
+        # Signature and header only
+        url = 'data:image/png;base64,' + base64.b64encode(
+            fd.read()[:33]).decode('ascii')
+    paragraph, = unwrap_html_body(parse('<p><img src="%s">' % url))
+    img, = paragraph.children
+    assert img.replacement.get_intrinsic_size(1, 16) == (4, 4)
+    with capture_logs() as logs:
+        assert img.replacement.image_surface is None
+        assert img.replacement.image_surface is None
+    assert len(logs) == 1
+    assert 'WARNING: Failed to load image' in logs[0]
+
+    # Images with an alt-text are decoded before the layout
+    with capture_logs() as logs:
+        paragraph, = unwrap_html_body(
+            parse('<p><img src="%s" alt="Lorem">' % url))
+    assert len(logs) == 1
+    assert 'WARNING: Failed to load image' in logs[0]
+    img, = paragraph.children
+    text, = img.children
+    assert text.text == 'Lorem'
+
+
 @assert_no_logs
 def test_tables():
     # Rules in http://www.w3.org/TR/CSS21/tables.html#anonymous-boxes
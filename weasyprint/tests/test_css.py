@@ -12,13 +12,19 @@
 
 from __future__ import division, unicode_literals
 
+import os
+
 from pytest import raises
 
 from .testing_utils import (
-    resource_filename, assert_no_logs, capture_logs, FakeHTML)
+    resource_filename, assert_no_logs, capture_logs, FakeHTML, temp_directory)
 from .. import css
+from ..css import properties
+from ..css import stylesheet_cache
 from ..css import get_all_computed_styles
+from ..css import computed_values
 from ..css.computed_values import strut_layout
+from ..lru import LRUCache
 from ..urls import open_data_url, path2url
 from .. import CSS, default_url_fetcher
 
@@ -67,6 +73,21 @@ def test_style_dict():
     assert style.margin_left == 12
     with raises(KeyError):
         style.position  # pylint: disable=W0104
+    assert 'display' in style
+    assert 'position' not in style
+    assert 'foo' not in style
+
+    copy = style.copy()
+    copy.display = 'inline'
+    style.margin_left = 13
+    assert style.display == 'block'
+    assert copy.display == 'inline'
+    assert copy.margin_left == 12
+    assert not copy.anonymous
+
+    child = style.inherit_from()
+    assert child.anonymous
+    assert child.display == properties.INITIAL_VALUES['display']
 
 
 @assert_no_logs
@@ -352,6 +373,59 @@ def test_line_height_inheritance():
     assert paragraph.style.vertical_align == 14  # 50% of 28px
 
 
+@assert_no_logs
+def test_font_metrics_cache():
+    """Test the cache of metrics used by ex and ch units and line heights."""
+    cache = computed_values.FONT_METRICS_CACHE
+    cache.clear()
+    document = FakeHTML(string='''
+        <style>
+            p { margin: 1ex 2ex 1ch 2ch }
+            em { font-size: 20px; margin: 1ex }
+        </style>
+        <p></p><p><em></em></p><p lang=fr></p>
+    ''')
+    style_for = get_all_computed_styles(document)
+    _head, body = document.root_element
+    p_1, p_2, p_3 = body
+    em, = p_2
+    # One miss for ex and ch with each font, lang is part of the font. The
+    # second paragraph shares the style of the first one.
+    assert cache.misses == 4
+    assert cache.hits == 8
+    margin_top, margin_right, margin_bottom, margin_left = [
+        style_for(p_1)['margin_' + side].value
+        for side in ('top', 'right', 'bottom', 'left')]
+    assert margin_top * 2 == margin_right
+    assert margin_bottom * 2 == margin_left
+    assert style_for(em).margin_top.value == margin_top * 20 / 16
+
+    assert strut_layout(style_for(p_1)) == strut_layout(style_for(p_2))
+    assert cache.misses == 5
+    assert cache.hits == 9
+    strut_layout(style_for(p_1), hinting=False)
+    strut_layout(style_for(em))
+    assert cache.misses == 7
+
+
+@assert_no_logs
+def test_lru_cache():
+    """Test the size limit of LRU caches."""
+    cache = LRUCache(max_size=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
 @assert_no_logs
 def test_important():
     document = FakeHTML(string='''
@@ -412,3 +486,168 @@ def test_units():
     # Ahem: 1ex is 0.8em, 1ch is 1em
     assert margins == [96, 96, 96, 96, 96, 96, 96, 17.6, 17.6, 15.4, 12]
     assert 4 < default_font_ch < 12  # for 1em = 16px
+
+
+@assert_no_logs
+def test_selector_index():
+    """Test selectors indexed by their rightmost id, class or tag."""
+    document = FakeHTML(string='''
+        <style>
+            * { margin-top: 1px }
+            .a { margin-top: 2px }
+            ul > li + li { margin-top: 3px }
+            section li:first-child.a { margin-top: 4px }
+            #last { margin-top: 5px }
+            div p .a { margin-top: 6px }
+            h1 ~ ul li:last-child { margin-left: 7px }
+            li { margin-bottom: 8px }
+            li { margin-bottom: 9px }
+            :not(.b).c { margin-bottom: 10px }
+        </style>
+        <h1></h1>
+        <ul><li class=a><li class="b	a"><li class="a c" id=last></ul>
+        <section><ul><li class=a><li class=c></ul></section>
+    ''')
+    style_for = get_all_computed_styles(document)
+
+    _head, body = document.root_element
+    _h1, ul_1, section = body
+    ul_2, = section
+    items = list(ul_1) + list(ul_2)
+    assert [style_for(li).margin_top for li in items] == [
+        (2, 'px'), (2, 'px'), (5, 'px'), (4, 'px'), (3, 'px')]
+    assert [style_for(li).margin_bottom for li in items] == [
+        (9, 'px'), (9, 'px'), (10, 'px'), (9, 'px'), (10, 'px')]
+    assert [style_for(li).margin_left for li in items] == [
+        (0, 'px'), (0, 'px'), (7, 'px'), (0, 'px'), (0, 'px')]
+    assert style_for(ul_1).margin_top == (1, 'px')
+
+
+@assert_no_logs
+def test_style_sharing():
+    """Test computed styles shared between similar elements."""
+    document = FakeHTML(string='''
+        <style>
+            li { margin-top: 1px }
+            li:nth-child(2) { margin-top: 2px }
+            li::before { content: "a" attr(title) }
+            #c { color: red }
+        </style>
+        <ul><li><li><li><li id=c><li lang=fr><li lang=fr><li title=b></ul>
+        <ul><li><li></ul>
+    ''', base_url=resource_filename('<inline HTML>'))
+    style_for = get_all_computed_styles(document)
+
+    _head, body = document.root_element
+    ul_1, ul_2 = body
+    li_1, li_2, li_3, li_4, li_5, li_6, li_7 = ul_1
+    li_8, li_9 = ul_2
+    assert style_for(li_1) is style_for(li_3)
+    assert style_for(li_2) is not style_for(li_1)
+    assert style_for(li_2).margin_top == (2, 'px')
+    assert style_for(li_4).color == (1, 0, 0, 1)
+    assert style_for(li_4) is not style_for(li_1)
+    # The lang attribute is mapped to the lang property
+    assert style_for(li_5) is not style_for(li_6)
+    assert style_for(li_5).lang == style_for(li_6).lang == 'fr'
+    # Siblings in another list have the same parent style
+    assert style_for(li_8) is style_for(li_1)
+    assert style_for(li_9) is style_for(li_2)
+    # attr() depends on the element
+    assert style_for(li_1, 'before') is not style_for(li_3, 'before')
+    assert style_for(li_1, 'before').content == [
+        ('STRING', 'a'), ('STRING', '')]
+    assert style_for(li_7, 'before').content == [
+        ('STRING', 'a'), ('STRING', 'b')]
+
+
+@assert_no_logs
+def test_sparse_cascade():
+    """Test values of properties that are not in the cascade."""
+    document = FakeHTML(string='''
+        <style>
+            html { color: red; font-size: 10px }
+            body { font-size: 20px; column-gap: normal; border: 2px solid;
+                   margin: 1em }
+            p { color: initial; border-top-style: inherit; margin: inherit }
+            em { font-size: inherit; display: inherit; border-width: inherit }
+        </style>
+        <p><em></em></p>
+    ''')
+    style_for = get_all_computed_styles(document)
+
+    html = document.root_element
+    _head, body = html
+    paragraph, = body
+    emphasis, = paragraph
+    assert style_for(html).column_gap == 10
+    assert style_for(body).color == (1, 0, 0, 1)
+    assert style_for(body).column_gap == 20
+    assert style_for(body).border_top_width == 2
+    assert style_for(body).margin_top == (20, 'px')
+    assert style_for(paragraph).color == (0, 0, 0, 1)
+    assert style_for(paragraph).font_size == 20
+    assert style_for(paragraph).column_gap == 20
+    assert style_for(paragraph).border_top_style == 'solid'
+    assert style_for(paragraph).border_top_width == 3
+    assert style_for(paragraph).border_left_width == 0
+    assert style_for(paragraph).margin_top == (20, 'px')
+    assert style_for(emphasis).color == (0, 0, 0, 1)
+    assert style_for(emphasis).font_size == 20
+    assert style_for(emphasis).display == 'block'
+    assert style_for(emphasis).border_top_width == 3
+    assert style_for(emphasis).margin_top == (0, 'px')
+
+
+@assert_no_logs
+def test_stylesheet_cache():
+    """Test the on-disk cache of preprocessed stylesheets."""
+    source = '''
+        p.a, #b > p::before { color: red; margin: 1px 2px }
+        @page :first { margin: 3px; @top-left { content: "top" } }
+    '''
+    previous_directory = stylesheet_cache.CACHE_DIRECTORY
+    try:
+        with temp_directory() as directory:
+            stylesheet_cache.CACHE_DIRECTORY = directory
+            parsed = CSS(string=source)
+            assert parsed.stylesheet is not None
+            assert len(os.listdir(directory)) == 1
+
+            cached = CSS(string=source)
+            assert cached.stylesheet is None
+            assert len(cached.rules) == len(parsed.rules) == 3
+            for rule_1, rule_2 in zip(parsed.rules, cached.rules):
+                _, selectors_1, declarations_1 = rule_1
+                _, selectors_2, declarations_2 = rule_2
+                assert declarations_1 == declarations_2
+                assert [
+                    (selector.specificity, selector.pseudo_element,
+                     selector.key) for selector in selectors_1
+                ] == [
+                    (selector.specificity, selector.pseudo_element,
+                     selector.key) for selector in selectors_2]
+
+            document = FakeHTML(string='<div id=b><p class=a>')
+            style_for = get_all_computed_styles(
+                document, user_stylesheets=[cached])
+            paragraph, = document.root_element.iter('p')
+            assert style_for(paragraph).color == (1, 0, 0, 1)
+            assert style_for(paragraph, 'before').margin_left == (2, 'px')
+            assert style_for('first_left_page').margin_top == (3, 'px')
+            assert style_for('first_left_page', '@top-left').content == [
+                ('STRING', 'top')]
+
+            # Other media types and base URLs are cached separately
+            assert CSS(string=source, media_type='screen').stylesheet
+            assert CSS(string=source, base_url='http://a/').stylesheet
+            assert len(os.listdir(directory)) == 3
+
+            # Imported stylesheets are not part of the key, only themselves
+            # are cached
+            source = '@import "%s"' % path2url(resource_filename('user.css'))
+            assert CSS(string=source).stylesheet
+            assert CSS(string=source).stylesheet
+            assert len(os.listdir(directory)) == 4
+    finally:
+        stylesheet_cache.CACHE_DIRECTORY = previous_directory
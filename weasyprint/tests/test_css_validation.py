@@ -691,6 +691,17 @@ def test_expand_word_wrap():
     assert_invalid('word-wrap: normal, break-word')
 
 
+@assert_no_logs
+def test_table_sample_rows():
+    assert expand_to_dict('-weasy-table-sample-rows: none') == {
+        'table_sample_rows': 'none'}
+    assert expand_to_dict('-weasy-table-sample-rows: 100') == {
+        'table_sample_rows': 100}
+    assert_invalid('-weasy-table-sample-rows: 0')
+    assert_invalid('-weasy-table-sample-rows: 1.5')
+    assert_invalid('-weasy-table-sample-rows: auto')
+
+
 @assert_no_logs
 def test_radial_gradient():
     red = (1, 0, 0, 1)
@@ -1280,6 +1280,16 @@ def test_images():
             </style>
             <div><img src="%s"></div>
         ''' % filename)
+    # Backgrounds are drawn in PDF sub-surfaces, JPEG images must be decoded
+    # there too when the output is not PDF
+    assert_pixels('background_image_jpeg', 8, 8, blue_image, '''
+        <style>
+            @page { size: 8px }
+            body { margin: 2px; background: #fff }
+            div { background: url(blue.jpg); width: 4px; height: 4px }
+        </style>
+        <div></div>
+    ''')
     assert_pixels('block_image', 8, 8, centered_image, '''
         <style>
             @page { size: 8px }
@@ -19,6 +19,7 @@ import pytest
 
 from .testing_utils import FONTS, assert_no_logs, capture_logs, almost_equal
 from ..formatting_structure import boxes
+from ..layout import preferred
 from .test_boxes import render_pages as parse
 
 
@@ -2830,6 +2831,31 @@ def test_fixed_positioning():
     html, = page_3.children
     assert [c.element_tag for c in html.children] == ['p', 'body']
 
+    # Fixed boxes are repeated on many pages
+    pages = parse('''
+        <style>
+            @page { size: 100px }
+            body { margin: 0 }
+            div { page-break-after: always }
+        </style>
+        <p style="position: fixed; top: 10px; left: 20px; margin: 0">b</p>
+    ''' + '<div>a</div>' * 100)
+    assert len(pages) == 100
+    fixed_boxes = []
+    for i, page in enumerate(pages):
+        html, = page.children
+        if i == 0:
+            # The fixed box is still in its parent on its own page
+            body, = html.children
+            p, div = body.children
+        else:
+            p, body = html.children
+        assert p.element_tag == 'p'
+        assert (p.position_x, p.position_y) == (20, 10)
+        fixed_boxes.append(p)
+    # Each page has its own boxes
+    assert len(set(id(p) for p in fixed_boxes)) == 100
+
 
 @assert_no_logs
 def test_floats():
@@ -3011,6 +3037,22 @@ def test_floats():
     # https://github.com/Kozea/WeasyPrint/issues/263
     page, = parse('''<div style="top:100%; float:left">''')
 
+    # Many floats in the same block formatting context
+    page, = parse('''
+        <style>
+            @page { size: 100px 1000px }
+            body { margin: 0 }
+            div { float: left; width: 10px; height: 10px }
+            p { clear: both; height: 10px; margin: 0 }
+        </style>''' + '<div></div>' * 300 + '<p></p>')
+    html, = page.children
+    body, = html.children
+    assert len(body.children) == 301
+    for i, div in enumerate(body.children[:300]):
+        assert outer_area(div) == ((i % 10) * 10, (i // 10) * 10, 10, 10)
+    p = body.children[-1]
+    assert p.position_y == 300
+
 
 @assert_no_logs
 def test_floats_page_breaks():
@@ -3490,6 +3532,61 @@ def test_radial_gradient():
            init=(40, 210, 0, 360 * sqrt2), scale_y=210/360)
 
 
+@assert_no_logs
+def test_nested_shrink_to_fit():
+    """Test the content widths of deeply nested shrink-to-fit boxes."""
+    depth = 20
+    page, = parse('''
+        <style>
+            div { float: left; padding: 1px; font-family: ahem }
+            table { border-spacing: 0 }
+            td { padding: 0 }
+        </style>
+        %s<div>ab cde</div>%s
+    ''' % ('<div><table><tr><td>' * depth, '</td></tr></table></div>' * depth))
+    html, = page.children
+    body, = html.children
+    div, = body.children
+    for level in range(depth, 0, -1):
+        # Each level is 2px larger than the next one
+        assert div.width == 6 * 16 + 2 * level
+        wrapper, = div.children
+        table, = wrapper.children
+        row_group, = table.children
+        row, = row_group.children
+        cell, = row.children
+        div, = cell.children
+    assert div.width == 6 * 16
+
+
+@assert_no_logs
+def test_nested_shrink_to_fit_cache():
+    """Test that content widths of nested boxes are computed once."""
+    def count_computations(depth):
+        calls = []
+
+        def counting_block_max_content_width(context, box, outer=True):
+            calls.append(box)
+            return block_max_content_width(context, box, outer)
+
+        preferred.block_max_content_width = counting_block_max_content_width
+        try:
+            parse('''
+                <style>
+                    div { float: left; padding: 1px; font-family: ahem }
+                </style>
+                %s<div>ab cde</div>%s
+            ''' % ('<div><table><tr><td>' * depth,
+                   '</td></tr></table></div>' * depth))
+        finally:
+            preferred.block_max_content_width = block_max_content_width
+        return len(calls)
+
+    block_max_content_width = preferred.block_max_content_width
+    # Computations grow linearly with the depth, not exponentially
+    assert count_computations(20) <= 3 * count_computations(10)
+
+
 @assert_no_logs
 def test_shrink_to_fit_floating_point_error():
     """Test that no floating point error occurs during shrink to fit.
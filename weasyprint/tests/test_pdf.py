@@ -20,7 +20,7 @@ import cairocffi
 import pytest
 
 from .. import CSS, Attachment
-from .. import pdf
+from .. import images, pdf
 from ..images import CAIRO_HAS_MIME_DATA
 from ..urls import path2url
 from .testing_utils import (
@@ -312,6 +312,26 @@ def test_jpeg():
     # JPEG-encoded image, embedded in PDF:
     assert b'/Filter /DCTDecode' in render('<img src="blue.jpg">')
 
+    # JPEG images are embedded without being decoded
+    decoded_urls = []
+    decode_raster_image = images.decode_raster_image
+
+    def counting_decode_raster_image(url, string, format_name):
+        decoded_urls.append(url)
+        return decode_raster_image(url, string, format_name)
+
+    images.decode_raster_image = counting_decode_raster_image
+    try:
+        pdf_bytes = render('<img src="blue.jpg">')
+        assert decoded_urls == []
+        FakeHTML(base_url=resource_filename('dummy.html'),
+                 string='<img src="blue.jpg">').write_png()
+        assert len(decoded_urls) == 1
+    finally:
+        images.decode_raster_image = decode_raster_image
+    with open(resource_filename('blue.jpg'), 'rb') as fd:
+        assert fd.read() in pdf_bytes
+
 
 @assert_no_logs
 def test_document_info():
@@ -1744,3 +1744,71 @@ def test_table_page_breaks():
         [['Header'], ['Row 4']],
         [['Row 5']]
     ]
+
+
+@assert_no_logs
+def test_table_repeated_groups():
+    """Test the headers and footers repeated on the pages of long tables."""
+    pages = parse('''
+        <style>
+            @page { size: 90px }
+            table { border-spacing: 0; font-size: 5px }
+            td { height: 20px; padding: 0 }
+        </style>
+        <table>
+            <thead><tr><td>Header</td></tr></thead>
+            <tfoot><tr><td>Footer</td></tr></tfoot>
+            <tbody>%s</tbody>
+        </table>
+    ''' % ('<tr><td>Row</td></tr>' * 10))
+    assert len(pages) == 5
+    headers = []
+    for page in pages:
+        html, = page.children
+        body, = html.children
+        table_wrapper, = body.children
+        table, = table_wrapper.children
+        header, body_group, footer = table.children
+        assert len(body_group.children) == 2
+        assert header.position_y == 0
+        assert header.children[0].children[0].position_y == 0
+        assert body_group.position_y == 20
+        assert footer.position_y == 60
+        assert footer.children[0].children[0].position_y == 60
+        cell, = header.children[0].children
+        line, = cell.children
+        text, = line.children
+        assert text.text == 'Header'
+        headers.append(header)
+    # Each page has its own boxes
+    assert len(set(id(header) for header in headers)) == 5
+
+
+@assert_no_logs
+def test_table_sample_rows():
+    """Test the column widths of tables measuring only some of their rows."""
+    def get_column_widths(sample_rows, rows):
+        page, = parse('''
+            <style>
+                table { font-family: ahem; border-spacing: 0;
+                        -weasy-table-sample-rows: %s }
+                td { padding: 0 }
+            </style>
+            <table>%s</table>
+        ''' % (sample_rows, ''.join(
+            '<tr><td>%s</td><td>a</td></tr>' % row for row in rows)))
+        html, = page.children
+        body, = html.children
+        table_wrapper, = body.children
+        table, = table_wrapper.children
+        return table.column_widths
+
+    rows = ['aa', 'a', 'a a a', 'a']
+    assert get_column_widths('none', rows) == [5 * 16, 16]
+    # The third row has a longer text than the first one
+    assert get_column_widths(1, rows) == [5 * 16, 16]
+    # Rows with shorter texts than the first ones are not measured
+    rows = ['aaa', 'a', '<span style="font-size: 2em">aa</span>']
+    assert get_column_widths('none', rows) == [4 * 16, 16]
+    assert get_column_widths(1, rows) == [3 * 16, 16]
+    assert get_column_widths(3, rows) == [4 * 16, 16]
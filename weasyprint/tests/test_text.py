@@ -12,9 +12,14 @@
 
 from __future__ import division, unicode_literals
 
+import threading
+
 from ..css import StyleDict
 from ..css.properties import INITIAL_VALUES
-from ..text import split_first_line
+from ..text import (
+    HYPHENATION_CACHE, LINE_WIDTHS_CACHE, THREAD_DATA, Layout,
+    get_text_engine, hyphenate_word, line_widths, paragraph_length,
+    split_first_line, utf8_slice)
 from .test_layout import parse, body_children
 from .testing_utils import FONTS, assert_no_logs
 
@@ -69,6 +74,43 @@ def test_line_breaking():
     assert string[resume_at:] == 'text for test'
 
 
+@assert_no_logs
+def test_paragraph_line_breaking():
+    """Test the line breaks of long texts, broken into lines only once."""
+    text = ' '.join('word%i' % i for i in range(50))
+    # Narrow characters, more than the number of characters guessed for
+    # a line are needed
+    style = StyleDict({
+        'font_family': ['Nimbus Mono L', 'Liberation Mono', 'FreeMono',
+                        'monospace'],
+        'letter_spacing': -5,
+    }, INITIAL_VALUES)
+
+    def split_lines(keep_paragraph):
+        lines = []
+        remaining = text
+        while remaining is not None:
+            if not keep_paragraph:
+                THREAD_DATA.__dict__.pop('paragraph', None)
+            _, length, resume_at, width, _, _ = split_first_line(
+                remaining, style, hinting=False, max_width=100,
+                line_width=None)
+            lines.append((utf8_slice(remaining, slice(length)), width))
+            if resume_at is not None:
+                remaining = utf8_slice(remaining, slice(resume_at, None))
+                if keep_paragraph and len(lines) == 1:
+                    assert paragraph_length(
+                        remaining, style, False, 100 * (1 + 1e-9)) < len(
+                            remaining)
+            else:
+                remaining = None
+        return lines
+
+    lines = split_lines(keep_paragraph=False)
+    assert len(lines) > 5
+    assert split_lines(keep_paragraph=True) == lines
+
+
 @assert_no_logs
 def test_text_dimension():
     """Test the font size impact on the text dimension."""
@@ -79,6 +121,49 @@ def test_text_dimension():
     assert width_1 * height_1 < width_2 * height_2
 
 
+@assert_no_logs
+def test_text_engine():
+    """Test the Pango objects shared by layouts."""
+    style = StyleDict({'font_family': FONTS}, INITIAL_VALUES)
+    layout_1 = Layout(hinting=False, font_size=16, style=style)
+    layout_2 = Layout(hinting=False, font_size=16, style=style)
+    layout_3 = Layout(hinting=True, font_size=16, style=style)
+    layout_4 = Layout(
+        hinting=False, font_size=16, style=style.updated_copy({'lang': 'fr'}))
+    layout_5 = Layout(hinting=False, font_size=20, style=style)
+    assert layout_1.layout != layout_2.layout
+    assert layout_1.context == layout_2.context == layout_5.context
+    assert layout_1.context != layout_3.context
+    assert layout_1.context != layout_4.context
+    assert layout_1.font == layout_2.font == layout_3.font == layout_4.font
+    assert layout_1.font != layout_5.font
+
+    # Each thread has its own Pango objects
+    engines = []
+    thread = threading.Thread(
+        target=lambda: engines.append(get_text_engine()))
+    thread.start()
+    thread.join()
+    assert engines[0] is not get_text_engine()
+
+
+@assert_no_logs
+def test_line_widths_cache():
+    """Test the cache of text widths used for preferred widths."""
+    LINE_WIDTHS_CACHE.clear()
+    style = StyleDict({'font_family': FONTS}, INITIAL_VALUES)
+    width, = line_widths('a b', style, False, None)
+    assert line_widths('a b', style, False, None) == (width,)
+    assert (LINE_WIDTHS_CACHE.hits, LINE_WIDTHS_CACHE.misses) == (1, 1)
+
+    width_a, width_b = line_widths('a b', style, False, 0)
+    assert width_a + width_b < width
+    big_width, = line_widths(
+        'a b', style.updated_copy({'font_size': 32}), False, None)
+    assert big_width > width
+    assert (LINE_WIDTHS_CACHE.hits, LINE_WIDTHS_CACHE.misses) == (1, 3)
+
+
 @assert_no_logs
 def test_text_font_size_zero():
     """Test a text with a font size set to 0."""
@@ -528,6 +613,17 @@ def test_hyphenate_limit_zone():
     assert full_text == 'mmmmmhyphénation'
 
 
+@assert_no_logs
+def test_hyphenation_cache():
+    """Test the cache of hyphenation points."""
+    HYPHENATION_CACHE.clear()
+    starts = hyphenate_word('hyphenation', 'en_US', 2, 2, 5)
+    assert starts == ('hyphen', 'hy')
+    assert hyphenate_word('hyphenation', 'en_US', 2, 2, 5) is starts
+    assert hyphenate_word('hyphenation', 'en_US', 3, 3, 5) == ('hyphen',)
+    assert (HYPHENATION_CACHE.hits, HYPHENATION_CACHE.misses) == (1, 2)
+
+
 @assert_no_logs
 def test_hyphenate_limit_chars():
     def line_count(limit_chars):
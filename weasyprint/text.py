@@ -13,17 +13,18 @@
 from __future__ import division
 # XXX No unicode_literals, cffi likes native strings
 
-import pyphen
+import bisect
 import cffi
 import cairocffi as cairo
 import re
+import threading
 
 from .compat import basestring
 from .logger import LOGGER
+from .lru import LRUCache
 
 
-ffi = cffi.FFI()
-ffi.cdef('''
+PANGO_DECLARATIONS = '''
     typedef enum {
         PANGO_STYLE_NORMAL,
         PANGO_STYLE_OBLIQUE,
@@ -100,6 +101,9 @@ ffi.cdef('''
 
 
     PangoLayout * pango_cairo_create_layout (cairo_t *cr);
+    PangoContext * pango_cairo_create_context (cairo_t *cr);
+    void pango_cairo_update_context (cairo_t *cr, PangoContext *context);
+    PangoLayout * pango_layout_new (PangoContext *context);
     void pango_layout_set_width (PangoLayout *layout, int width);
     void pango_layout_set_attributes(
         PangoLayout *layout, PangoAttrList *attrs);
@@ -199,7 +203,14 @@ ffi.cdef('''
     void pango_cairo_update_layout (cairo_t *cr, PangoLayout *layout);
     void pango_cairo_show_layout_line (cairo_t *cr, PangoLayoutLine *line);
 
-''')
+'''
+
+
+def font_key(style):
+    """Return a hashable key of the font-related properties of ``style``."""
+    return tuple(
+        tuple(value) if isinstance(value, list) else value
+        for value in (style[name] for name in FONT_PROPERTIES))
 
 
 def dlopen(ffi, *names):
@@ -213,44 +224,89 @@ def dlopen(ffi, *names):
     return ffi.dlopen(names[0])  # pragma: no cover
 
 
-gobject = dlopen(ffi, 'gobject-2.0', 'libgobject-2.0-0', 'libgobject-2.0.so',
-                 'libgobject-2.0.dylib')
-pango = dlopen(ffi, 'pango-1.0', 'libpango-1.0-0', 'libpango-1.0.so',
-               'libpango-1.0.dylib')
-pangocairo = dlopen(ffi, 'pangocairo-1.0', 'libpangocairo-1.0-0',
-                    'libpangocairo-1.0.so', 'libpangocairo-1.0.dylib')
-
-gobject.g_type_init()
-
-units_to_double = pango.pango_units_to_double
-units_from_double = pango.pango_units_from_double
+# Parsing the declarations is a large part of the time taken to import
+# WeasyPrint. The libraries are only loaded when the first Layout is created,
+# see load_pango().
+ffi = gobject = pango = pangocairo = None
+units_to_double = units_from_double = None
+PANGO_LOCK = threading.Lock()
 
 PYPHEN_DICTIONARY_CACHE = {}
 
+# Hyphenation points of words, the same words are often hyphenated many times
+# when they are at the end of lines in documents or in successive layouts.
+HYPHENATION_CACHE = LRUCache(max_size=4096)
+
+# Properties used by Layout, and by OpenType features set in create_layout:
+# values measured with a layout only depend on them and on the font size.
+FONT_PROPERTIES = (
+    'font_family', 'font_style', 'font_stretch', 'font_weight', 'lang',
+    'font_language_override', 'font_kerning', 'font_variant_ligatures',
+    'font_variant_position', 'font_variant_caps', 'font_variant_numeric',
+    'font_variant_alternates', 'font_variant_east_asian',
+    'font_feature_settings')
+
+# Results of line_widths(), keyed by the text, font_key() and the other
+# properties changing the widths. The ``hits`` and ``misses`` attributes of the
+# cache count lookups.
+LINE_WIDTHS_CACHE = LRUCache(max_size=16384)
+
+PANGO_STYLE = {}
+PANGO_STRETCH = {}
+PANGO_WRAP_MODE = {}
+
+
+def load_pango():
+    """Declare and load the Pango libraries, if not done yet."""
+    global ffi, gobject, pango, pangocairo
+    global units_to_double, units_from_double
+    if pango is not None:
+        return
+    with PANGO_LOCK:
+        if pango is not None:
+            return
+        ffi = cffi.FFI()
+        ffi.cdef(PANGO_DECLARATIONS)
+        gobject = dlopen(
+            ffi, 'gobject-2.0', 'libgobject-2.0-0', 'libgobject-2.0.so',
+            'libgobject-2.0.dylib')
+        pango_library = dlopen(
+            ffi, 'pango-1.0', 'libpango-1.0-0', 'libpango-1.0.so',
+            'libpango-1.0.dylib')
+        pangocairo = dlopen(
+            ffi, 'pangocairo-1.0', 'libpangocairo-1.0-0',
+            'libpangocairo-1.0.so', 'libpangocairo-1.0.dylib')
+
+        gobject.g_type_init()
+
+        units_to_double = pango_library.pango_units_to_double
+        units_from_double = pango_library.pango_units_from_double
+
+        PANGO_STYLE.update({
+            'normal': pango_library.PANGO_STYLE_NORMAL,
+            'oblique': pango_library.PANGO_STYLE_OBLIQUE,
+            'italic': pango_library.PANGO_STYLE_ITALIC,
+        })
+        PANGO_STRETCH.update({
+            'ultra-condensed': pango_library.PANGO_STRETCH_ULTRA_CONDENSED,
+            'extra-condensed': pango_library.PANGO_STRETCH_EXTRA_CONDENSED,
+            'condensed': pango_library.PANGO_STRETCH_CONDENSED,
+            'semi-condensed': pango_library.PANGO_STRETCH_SEMI_CONDENSED,
+            'normal': pango_library.PANGO_STRETCH_NORMAL,
+            'semi-expanded': pango_library.PANGO_STRETCH_SEMI_EXPANDED,
+            'expanded': pango_library.PANGO_STRETCH_EXPANDED,
+            'extra-expanded': pango_library.PANGO_STRETCH_EXTRA_EXPANDED,
+            'ultra-expanded': pango_library.PANGO_STRETCH_ULTRA_EXPANDED,
+        })
+        PANGO_WRAP_MODE.update({
+            'WRAP_WORD': pango_library.PANGO_WRAP_WORD,
+            'WRAP_CHAR': pango_library.PANGO_WRAP_CHAR,
+            'WRAP_WORD_CHAR': pango_library.PANGO_WRAP_WORD_CHAR
+        })
+
+        # Set last, other threads can use Pango as soon as it is not None
+        pango = pango_library
 
-PANGO_STYLE = {
-    'normal': pango.PANGO_STYLE_NORMAL,
-    'oblique': pango.PANGO_STYLE_OBLIQUE,
-    'italic': pango.PANGO_STYLE_ITALIC,
-}
-
-PANGO_STRETCH = {
-    'ultra-condensed': pango.PANGO_STRETCH_ULTRA_CONDENSED,
-    'extra-condensed': pango.PANGO_STRETCH_EXTRA_CONDENSED,
-    'condensed': pango.PANGO_STRETCH_CONDENSED,
-    'semi-condensed': pango.PANGO_STRETCH_SEMI_CONDENSED,
-    'normal': pango.PANGO_STRETCH_NORMAL,
-    'semi-expanded': pango.PANGO_STRETCH_SEMI_EXPANDED,
-    'expanded': pango.PANGO_STRETCH_EXPANDED,
-    'extra-expanded': pango.PANGO_STRETCH_EXTRA_EXPANDED,
-    'ultra-expanded': pango.PANGO_STRETCH_ULTRA_EXPANDED,
-}
-
-PANGO_WRAP_MODE = {
-    'WRAP_WORD': pango.PANGO_WRAP_WORD,
-    'WRAP_CHAR': pango.PANGO_WRAP_CHAR,
-    'WRAP_WORD_CHAR': pango.PANGO_WRAP_WORD_CHAR
-}
 
 # From http://www.microsoft.com/typography/otspec/languagetags.htm
 LST_TO_ISO = {
@@ -570,7 +626,8 @@ def first_line_metrics(first_line, text, layout, resume_at, space_collapse,
         length -= len(hyphenation_character.encode('utf8'))
     elif resume_at:
         # Create layout with final text
-        first_line_text = utf8_slice(text, slice(length))
+        # The text of the layout starts with the first line of text
+        first_line_text = layout.text_bytes[:length].decode('utf8')
         # Remove trailing spaces if spaces collapse
         if space_collapse:
             first_line_text = first_line_text.rstrip(u' ')
@@ -594,46 +651,125 @@ def first_line_metrics(first_line, text, layout, resume_at, space_collapse,
     return layout, length, resume_at, width, height, baseline
 
 
+class TextEngine(object):
+    """Pango objects shared by the layouts created in a thread.
+
+    Creating a cairo surface and context and a Pango context for each
+    layout is slow. Layouts with the same hinting mode and language share
+    a Pango context, and layouts with the same font share a font
+    description.
+
+    Use :func:`get_text_engine` to get the engine of the current thread.
+
+    """
+    def __init__(self):
+        load_pango()
+        # Keys: hinting. Values: cairo contexts whose font options and
+        # transformation are used by Pango contexts.
+        self.dummy_contexts = {
+            True: cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)),
+            False: cairo.Context(cairo.PDFSurface(None, 1, 1))}
+        # Keys: (hinting, language string or None). Values: PangoContext.
+        self.contexts = {}
+        # Keys: (family, style, stretch, weight, size in Pango units).
+        # Values: PangoFontDescription.
+        self.font_descriptions = LRUCache(max_size=256)
+
+    def get_context(self, hinting, language):
+        """Get the Pango context for ``hinting`` and ``language``.
+
+        The context must not be modified, except by :func:`show_first_line`
+        that restores it.
+
+        """
+        key = (hinting, language)
+        context = self.contexts.get(key)
+        if context is None:
+            context = ffi.gc(
+                pangocairo.pango_cairo_create_context(ffi.cast(
+                    'cairo_t *', self.dummy_contexts[hinting]._pointer)),
+                gobject.g_object_unref)
+            if language is not None:
+                language_p, _ = unicode_to_char_p(language)
+                pango.pango_context_set_language(
+                    context, pango.pango_language_from_string(language_p))
+            self.contexts[key] = context
+        return context
+
+    def get_font_description(self, style, font_size):
+        """Get the font description for ``style`` and ``font_size``."""
+        assert not isinstance(style.font_family, basestring), (
+            'font_family should be a list')
+        size = units_from_double(font_size)
+        key = (tuple(style.font_family), style.font_style,
+               style.font_stretch, style.font_weight, size)
+        font = self.font_descriptions.get(key)
+        if font is None:
+            font = ffi.gc(
+                pango.pango_font_description_new(),
+                pango.pango_font_description_free)
+            family_p, family = unicode_to_char_p(','.join(style.font_family))
+            pango.pango_font_description_set_family(font, family_p)
+            pango.pango_font_description_set_style(
+                font, PANGO_STYLE[style.font_style])
+            pango.pango_font_description_set_stretch(
+                font, PANGO_STRETCH[style.font_stretch])
+            pango.pango_font_description_set_weight(font, style.font_weight)
+            pango.pango_font_description_set_absolute_size(font, size)
+            self.font_descriptions[key] = font
+        return font
+
+
+THREAD_DATA = threading.local()
+
+# Number of lines laid out by split_first_line() for texts whose line breaks
+# are already known, see paragraph_length().
+PARAGRAPH_LINES = 3
+
+
+def get_text_engine():
+    """Return the :class:`TextEngine` of the current thread."""
+    engine = getattr(THREAD_DATA, 'text_engine', None)
+    if engine is None:
+        engine = THREAD_DATA.text_engine = TextEngine()
+    return engine
+
+
 class Layout(object):
     """Object holding PangoLayout-related cdata pointers."""
     def __init__(self, hinting, font_size, style):
-        self.dummy_context = (
-            cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
-            if hinting else
-            cairo.Context(cairo.PDFSurface(None, 1, 1)))
-        self.layout = ffi.gc(
-            pangocairo.pango_cairo_create_layout(ffi.cast(
-                'cairo_t *', self.dummy_context._pointer)),
-            gobject.g_object_unref)
-        self.font = font = ffi.gc(
-            pango.pango_font_description_new(),
-            pango.pango_font_description_free)
+        load_pango()
+        engine = get_text_engine()
         if style.font_language_override != 'normal':
-            lang_p, lang = unicode_to_char_p(LST_TO_ISO.get(
+            lang = LST_TO_ISO.get(
                 style.font_language_override.lower(),
-                style.font_language_override))
+                style.font_language_override)
         elif style.lang:
-            lang_p, lang = unicode_to_char_p(style.lang)
+            lang = style.lang
         else:
             lang = None
-            self.language = pango.pango_language_get_default()
+        self.hinting = hinting
+        self.style = style
+        self.max_width = None
+        # Keep references to the objects shared by layouts, they are used
+        # by get_font_metrics() and show_first_line().
+        self.dummy_context = engine.dummy_contexts[hinting]
+        self.context = engine.get_context(hinting, lang)
+        self.layout = ffi.gc(
+            pango.pango_layout_new(self.context), gobject.g_object_unref)
         if lang:
+            lang_p, lang = unicode_to_char_p(lang)
             self.language = pango.pango_language_from_string(lang_p)
-            context = pango.pango_layout_get_context(self.layout)
-            pango.pango_context_set_language(context, self.language)
+        else:
+            self.language = pango.pango_language_get_default()
+        self.font = engine.get_font_description(style, font_size)
+        pango.pango_layout_set_font_description(self.layout, self.font)
 
-        assert not isinstance(style.font_family, basestring), (
-            'font_family should be a list')
-        family_p, family = unicode_to_char_p(','.join(style.font_family))
-        pango.pango_font_description_set_family(font, family_p)
-        pango.pango_font_description_set_style(
-            font, PANGO_STYLE[style.font_style])
-        pango.pango_font_description_set_stretch(
-            font, PANGO_STRETCH[style.font_stretch])
-        pango.pango_font_description_set_weight(font, style.font_weight)
-        pango.pango_font_description_set_absolute_size(
-            font, units_from_double(font_size))
-        pango.pango_layout_set_font_description(self.layout, font)
+    def __reduce__(self):
+        # Pango objects cannot be pickled, create a new layout instead.
+        return create_layout, (
+            self.text_bytes.decode('utf8'), self.style, self.hinting,
+            self.max_width)
 
     def iter_lines(self):
         layout_iter = ffi.gc(
@@ -651,8 +787,7 @@ class Layout(object):
         pango.pango_layout_set_text(self.layout, text, -1)
 
     def get_font_metrics(self):
-        context = pango.pango_layout_get_context(self.layout)
-        return FontMetrics(context, self.font, self.language)
+        return FontMetrics(self.context, self.font, self.language)
 
     def set_wrap(self, wrap_mode):
         pango.pango_layout_set_wrap(self.layout, wrap_mode)
@@ -804,6 +939,7 @@ def create_layout(text, style, hinting, max_width):
     """
     layout = Layout(hinting, style.font_size, style)
     layout.set_text(text)
+    layout.max_width = max_width
 
     # Make sure that max_width * Pango.SCALE == max_width * 1024 fits in a
     # signed integer. Treat bigger values same as None: unconstrained width.
@@ -859,6 +995,69 @@ def create_layout(text, style, hinting, max_width):
     return layout
 
 
+def hyphenate_word(word, lang, left, right, total):
+    """Return the possible beginnings of ``word`` before a hyphen.
+
+    The beginnings are sorted from the longest to the shortest one.
+
+    """
+    # Pyphen is imported here as it is slow to import and often not needed
+    import pyphen
+
+    key = (lang, left, right, total, word)
+    starts = HYPHENATION_CACHE.get(key)
+    if starts is None:
+        dictionary_key = (lang, left, right, total)
+        dictionary = PYPHEN_DICTIONARY_CACHE.get(dictionary_key)
+        if dictionary is None:
+            dictionary = pyphen.Pyphen(lang=lang, left=left, right=right)
+            PYPHEN_DICTIONARY_CACHE[dictionary_key] = dictionary
+        starts = HYPHENATION_CACHE[key] = tuple(
+            start for start, end in dictionary.iterate(word))
+    return starts
+
+
+def paragraph_length(text, style, hinting, max_width):
+    """Return the length of text needed to lay out the first line of ``text``.
+
+    ``text`` is the end of a paragraph whose line breaks have been stored by
+    :func:`store_paragraph`, or ``None`` is returned. The given length covers
+    a few lines of the paragraph, and is ``len(text)`` for its last lines.
+
+    """
+    paragraph = getattr(THREAD_DATA, 'paragraph', None)
+    if paragraph is None:
+        return None
+    paragraph_text, paragraph_style, paragraph_hinting, paragraph_width, \
+        starts = paragraph
+    if not (paragraph_style is style and paragraph_hinting == hinting and
+            paragraph_width == max_width and
+            len(text) <= len(paragraph_text) and
+            paragraph_text.endswith(text)):
+        return None
+    offset = len(paragraph_text) - len(text)
+    # The text may start inside a stored line, when the previous line has
+    # been hyphenated for example: include this line and the next ones.
+    index = bisect.bisect_right(starts, offset) + PARAGRAPH_LINES - 1
+    if index < len(starts):
+        return starts[index] - offset
+    return len(text)
+
+
+def store_paragraph(text, style, hinting, max_width, layout):
+    """Store the line breaks of ``layout`` for next calls of
+    :func:`paragraph_length`."""
+    starts = []
+    text_bytes = layout.text_bytes
+    byte_index = index = 0
+    for line in layout.iter_lines():
+        index += len(
+            text_bytes[byte_index:line.start_index].decode('utf8'))
+        byte_index = line.start_index
+        starts.append(index)
+    THREAD_DATA.paragraph = (text, style, hinting, max_width, starts)
+
+
 def split_first_line(text, style, hinting, max_width, line_width):
     """Fit as much as possible in the available width for one line of text.
 
@@ -892,7 +1091,9 @@ def split_first_line(text, style, hinting, max_width, line_width):
     # Step #1: Get a draft layout with the first line
     layout = None
     if max_width:
-        expected_length = int(max_width / style.font_size * 2.5)
+        expected_length = paragraph_length(text, style, hinting, max_width)
+        if expected_length is None:
+            expected_length = int(max_width / style.font_size * 2.5)
         if expected_length < len(text):
             # Try to use a small amount of text instead of the whole text
             layout = create_layout(
@@ -909,6 +1110,10 @@ def split_first_line(text, style, hinting, max_width, line_width):
         lines = layout.iter_lines()
         first_line = next(lines, None)
         second_line = next(lines, None)
+        if max_width and second_line is not None:
+            # Keep the line breaks of the whole text, the next calls with
+            # the end of this text only lay out a few of its lines
+            store_paragraph(text, style, hinting, max_width, layout)
     resume_at = None if second_line is None else second_line.start_index
 
     # Step #2: Don't hyphenize when it's not needed
@@ -925,15 +1130,18 @@ def split_first_line(text, style, hinting, max_width, line_width):
     # Step #3: Try to put the first word of the second line on the first line
     if first_line_width <= max_width:
         # The first line may have been cut too early by Pango
+        # The text of the draft layout starts with the first two lines,
+        # don't encode the whole text
         second_line_index = second_line.start_index
-        first_line_text = utf8_slice(text, slice(second_line_index))
-        second_line_text = utf8_slice(text, slice(second_line_index, None))
+        first_line_text = layout.text_bytes[:second_line_index].decode('utf8')
     else:
         # The first word is longer than the line, try to hyphenize it
         first_line_text = ''
-        second_line_text = text
 
-    next_word = second_line_text.split(' ', 1)[0]
+    next_word_end = text.find(' ', len(first_line_text))
+    if next_word_end == -1:
+        next_word_end = len(text)
+    next_word = text[len(first_line_text):next_word_end]
     if next_word:
         if space_collapse:
             # next_word might fit without a space afterwards
@@ -946,9 +1154,11 @@ def split_first_line(text, style, hinting, max_width, line_width):
             first_line_width, _ = get_size(first_line, style)
             if second_line is None and first_line_width <= max_width:
                 # The next word fits in the first line, keep the layout
-                resume_at = len(new_first_line_text.encode('utf-8')) + 1
-                if resume_at == len(text.encode('utf-8')):
+                if len(new_first_line_text) + 1 == len(text):
+                    # Only the space after the next word is left
                     resume_at = None
+                else:
+                    resume_at = len(new_first_line_text.encode('utf-8')) + 1
                 return first_line_metrics(
                     first_line, text, layout, resume_at, space_collapse, style)
     elif first_line_text:
@@ -958,6 +1168,9 @@ def split_first_line(text, style, hinting, max_width, line_width):
             first_line, text, layout, resume_at, space_collapse, style)
 
     # Step #4: Try to hyphenize
+    # Pyphen is imported here as it is slow to import and often not needed
+    import pyphen
+
     hyphens = style.hyphens
     lang = style.lang and pyphen.language_fallback(style.lang)
     total, left, right = style.hyphenate_limit_chars
@@ -1000,40 +1213,55 @@ def split_first_line(text, style, hinting, max_width, line_width):
                     next_word[:i + 1] for i in soft_hyphen_indexes]
             elif hyphens == 'auto' and lang:
                 # The next word does not fit, try hyphenation
-                dictionary_key = (lang, left, right, total)
-                dictionary = PYPHEN_DICTIONARY_CACHE.get(dictionary_key)
-                if dictionary is None:
-                    dictionary = pyphen.Pyphen(
-                        lang=lang, left=left, right=right)
-                    PYPHEN_DICTIONARY_CACHE[dictionary_key] = dictionary
-                dictionary_iterations = [
-                    start for start, end in dictionary.iterate(next_word)]
+                dictionary_iterations = hyphenate_word(
+                    next_word, lang, left, right, total)
             else:
                 dictionary_iterations = []
 
             if dictionary_iterations:
-                for first_word_part in dictionary_iterations:
-                    new_first_line_text = first_line_text + first_word_part
-                    hyphenated_first_line_text = (
-                        new_first_line_text + style.hyphenate_character)
-                    new_layout = create_layout(
-                        hyphenated_first_line_text, style, hinting, max_width)
-                    new_lines = new_layout.iter_lines()
-                    new_first_line = next(new_lines, None)
-                    new_second_line = next(new_lines, None)
-                    new_first_line_width, _ = get_size(new_first_line, style)
-                    new_space = max_width - new_first_line_width
-                    if new_second_line is None and (
-                            new_space >= 0 or
-                            first_word_part == dictionary_iterations[-1]):
-                        hyphenated = True
-                        layout = new_layout
-                        first_line = new_first_line
-                        second_line = new_second_line
-                        resume_at = len(new_first_line_text.encode('utf8'))
-                        if text[len(new_first_line_text)] == soft_hyphen:
-                            resume_at += len(soft_hyphen.encode('utf8'))
-                        break
+                # The candidates are sorted from the longest to the shortest
+                # one: find the first one fitting in the line with a binary
+                # search, and keep the layouts of the candidates tried.
+                candidates = {}
+
+                def try_candidate(index):
+                    if index not in candidates:
+                        new_first_line_text = (
+                            first_line_text + dictionary_iterations[index])
+                        new_layout = create_layout(
+                            new_first_line_text + style.hyphenate_character,
+                            style, hinting, max_width)
+                        new_lines = new_layout.iter_lines()
+                        new_first_line = next(new_lines, None)
+                        new_second_line = next(new_lines, None)
+                        new_first_line_width, _ = get_size(
+                            new_first_line, style)
+                        fits = new_second_line is None and (
+                            max_width - new_first_line_width >= 0)
+                        candidates[index] = (
+                            fits, new_first_line_text, new_layout,
+                            new_first_line, new_second_line)
+                    return candidates[index]
+
+                low, high = 0, len(dictionary_iterations) - 1
+                while low < high:
+                    middle = (low + high) // 2
+                    if try_candidate(middle)[0]:
+                        high = middle
+                    else:
+                        low = middle + 1
+                (fits, new_first_line_text, new_layout, new_first_line,
+                 new_second_line) = try_candidate(low)
+                hyphenated_first_line_text = (
+                    new_first_line_text + style.hyphenate_character)
+                if new_second_line is None:
+                    hyphenated = True
+                    layout = new_layout
+                    first_line = new_first_line
+                    second_line = new_second_line
+                    resume_at = len(new_first_line_text.encode('utf8'))
+                    if text[len(new_first_line_text)] == soft_hyphen:
+                        resume_at += len(soft_hyphen.encode('utf8'))
 
                 if not hyphenated and not first_line_text:
                     # Recreate the layout with no max_width to be sure that
@@ -1081,10 +1309,11 @@ def split_first_line(text, style, hinting, max_width, line_width):
         next(temp_lines, None)
         temp_second_line = next(temp_lines, None)
         temp_second_line_index = (
-            len(text.encode('utf-8')) if temp_second_line is None
+            len(temp_layout.text_bytes) if temp_second_line is None
             else temp_second_line.start_index)
         resume_at = temp_second_line_index
-        first_line_text = utf8_slice(text, slice(temp_second_line_index))
+        first_line_text = temp_layout.text_bytes[
+            :temp_second_line_index].decode('utf8')
         layout = create_layout(first_line_text, style, hinting, max_width)
         lines = layout.iter_lines()
         first_line = next(lines, None)
@@ -1095,11 +1324,21 @@ def split_first_line(text, style, hinting, max_width, line_width):
 
 
 def line_widths(text, style, enable_hinting, width):
-    """Return the width for each line."""
-    layout = create_layout(text, style, enable_hinting, width)
-    for line in layout.iter_lines():
-        width, _height = get_size(line, style)
-        yield width
+    """Return a tuple of the width of each line.
+
+    Results are cached for all documents, as the same strings are often
+    measured many times.
+
+    """
+    key = (text, font_key(style), style.font_size, style.letter_spacing,
+           style.word_spacing, style.tab_size, enable_hinting, width)
+    widths = LINE_WIDTHS_CACHE.get(key)
+    if widths is None:
+        layout = create_layout(text, style, enable_hinting, width)
+        widths = tuple(
+            get_size(line, style)[0] for line in layout.iter_lines())
+        LINE_WIDTHS_CACHE[key] = widths
+    return widths
 
 
 def show_first_line(context, pango_layout, hinting):
@@ -1113,3 +1352,9 @@ def show_first_line(context, pango_layout, hinting):
     pango.pango_layout_set_width(pango_layout.layout, -1)
     pangocairo.pango_cairo_show_layout_line(
         context, next(pango_layout.iter_lines()))
+    if hinting:
+        # The Pango context is shared with other layouts, restore the font
+        # options and transformation used to measure text.
+        pangocairo.pango_cairo_update_context(
+            ffi.cast('cairo_t *', pango_layout.dummy_context._pointer),
+            pango_layout.context)